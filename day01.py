@@ -1,16 +1,87 @@
-def calculate_total_distance(left_list, right_list):
-    # Sort both lists
-    left_list.sort()
-    right_list.sort()
+import os
+import tempfile
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from heapq import merge
+from itertools import chain, islice, repeat
+from operator import sub
+
+# Below this many rows the plain loops beat the setup cost of the kernels
+SMALL_INPUT_ROWS = 256
+# Counting sort beats sorted() while the ID span is below about half the row
+# count (measured at 100k and 1M rows); wider spans pay for the empty slots
+COUNTING_SORT_MAX_SPAN_RATIO = 0.4
+# Lines parsed at a time by read_input_arrays and IDs per sorted block of an array
+BLOCK_ROWS = 1 << 16
+# Memory budget for the external-sort mode used on inputs larger than RAM
+DEFAULT_MAX_MEMORY_BYTES = 256 * 2**20
+
+
+def _distance_loop(left_list, right_list):
     total_distance = 0
-    # Calculate the total distance
-    for left, right in zip(left_list, right_list):
+    for left, right in zip(sorted(left_list), sorted(right_list)):
         total_distance += abs(left - right)
-
     return total_distance
 
 
+def _ascending(values):
+    if not isinstance(values, array):
+        return sorted(values)
+    # Merge sorted int64 blocks so an array never becomes a full-size list
+    blocks = (
+        values[start : start + BLOCK_ROWS]
+        for start in range(0, len(values), BLOCK_ROWS)
+    )
+    return merge(*[array("q", sorted(block)) for block in blocks])
+
+
+def _distance_sorted(left_list, right_list):
+    # Sort, subtract and reduce without a Python-level loop
+    return sum(map(abs, map(sub, _ascending(left_list), _ascending(right_list))))
+
+
+def _counting_sorted(values, low, high):
+    # Expand a histogram indexed by ``id - low`` back into ascending order
+    histogram = array("q", [0]) * (high - low + 1)
+    for location_id, count in Counter(values).items():
+        if not low <= location_id <= high:
+            raise ValueError(f"Location IDs fall outside the range [{low}, {high}]")
+        histogram[location_id - low] = count
+    return chain.from_iterable(map(repeat, range(low, high + 1), histogram))
+
+
+def _distance_counting(left_list, right_list, low, high):
+    left_sorted = _counting_sorted(left_list, low, high)
+    right_sorted = _counting_sorted(right_list, low, high)
+    return sum(map(abs, map(sub, left_sorted, right_sorted)))
+
+
+def calculate_total_distance(left_list, right_list, value_range=None):
+    """Sum of distances between the sorted columns.
+
+    ``value_range`` is an optional inclusive ``(low, high)`` bound on the IDs;
+    when the span is small compared to the row count a counting sort is used,
+    which raises ValueError if an ID falls outside the bound.
+    """
+    rows = min(len(left_list), len(right_list))
+    if rows == 0:
+        return 0
+    if rows < SMALL_INPUT_ROWS:
+        return _distance_loop(left_list, right_list)
+
+    if value_range is None:
+        low = min(min(left_list), min(right_list))
+        high = max(max(left_list), max(right_list))
+    else:
+        low, high = value_range
+    if high - low + 1 <= COUNTING_SORT_MAX_SPAN_RATIO * rows:
+        return _distance_counting(left_list, right_list, low, high)
+    return _distance_sorted(left_list, right_list)
+
+
 def calculate_similarity_score(left_list, right_list):
+    # The dict loop measured faster than Counter or array histograms at every size
     # Count occurrences in right list
     right_counts = {}
     for num in right_list:
@@ -37,14 +108,265 @@ def read_input(file_path):
     return left_list, right_list
 
 
+def read_input_arrays(file_path):
+    """Read both columns into two contiguous int64 arrays, one line block at a time."""
+    left_array = array("q")
+    right_array = array("q")
+    with open(file_path, "rb") as file:
+        while True:
+            tokens = b"".join(islice(file, BLOCK_ROWS)).split()
+            if not tokens:
+                break
+            if len(tokens) % 2:
+                raise ValueError(f"Odd number of location IDs in {file_path}")
+            left_array.extend(map(int, islice(tokens, 0, None, 2)))
+            right_array.extend(map(int, islice(tokens, 1, None, 2)))
+
+    return left_array, right_array
+
+
+# Rough peak bytes per row while a run is parsed and sorted (tokens + int objects)
+EXTERNAL_BYTES_PER_ROW = 320
+# Size of one spilled ID on disk
+ID_BYTES = array("q").itemsize
+# Most runs of one column merged at once, which bounds the open file count
+MAX_MERGE_RUNS = 64
+
+
+def _spill_sorted_runs(file_path, run_rows, tmp_dir):
+    """Split both columns into sorted runs of at most ``run_rows`` IDs on disk."""
+    left_runs = []
+    right_runs = []
+    with open(file_path, "rb") as file:
+        while True:
+            tokens = b"".join(islice(file, run_rows)).split()
+            if not tokens:
+                break
+            if len(tokens) % 2:
+                raise ValueError(f"Odd number of location IDs in {file_path}")
+
+            for runs, offset in ((left_runs, 0), (right_runs, 1)):
+                run_id = len(left_runs) + len(right_runs)
+                run_path = os.path.join(tmp_dir, f"run{run_id}.bin")
+                with open(run_path, "wb") as run_file:
+                    run = sorted(map(int, tokens[offset::2]))
+                    array("q", run).tofile(run_file)
+                runs.append(run_path)
+                del run
+            del tokens
+
+    return left_runs, right_runs
+
+
+def _iter_run(run_path, block_ids):
+    with open(run_path, "rb", buffering=0) as run_file:
+        while True:
+            data = run_file.read(block_ids * ID_BYTES)
+            if not data:
+                return
+            block = array("q")
+            block.frombytes(data)
+            yield from block
+
+
+def _merge_runs(runs, block_ids, tmp_dir):
+    """Merge ``runs`` in passes until at most MAX_MERGE_RUNS of them are left."""
+    while len(runs) > MAX_MERGE_RUNS:
+        merged_runs = []
+        for start in range(0, len(runs), MAX_MERGE_RUNS):
+            group = runs[start : start + MAX_MERGE_RUNS]
+            merged = merge(*(_iter_run(path, block_ids) for path in group))
+            fd, run_path = tempfile.mkstemp(suffix=".bin", dir=tmp_dir)
+            with open(fd, "wb") as run_file:
+                while True:
+                    block = array("q", islice(merged, block_ids))
+                    if not block:
+                        break
+                    block.tofile(run_file)
+            for path in group:
+                os.remove(path)
+            merged_runs.append(run_path)
+        runs = merged_runs
+    return runs
+
+
+@contextmanager
+def _external_sorted_columns(file_path, max_memory_bytes, tmp_dir=None):
+    """Yield both columns as ascending streams merged from on-disk sorted runs."""
+    run_rows = max(1, max_memory_bytes // EXTERNAL_BYTES_PER_ROW)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir:
+        left_runs, right_runs = _spill_sorted_runs(file_path, run_rows, run_dir)
+
+        # Split the budget between the read buffers of the runs merged at once
+        open_runs = max(
+            1,
+            min(len(left_runs), MAX_MERGE_RUNS) + min(len(right_runs), MAX_MERGE_RUNS),
+        )
+        block_ids = max(1, max_memory_bytes // (4 * ID_BYTES * open_runs))
+        left_runs = _merge_runs(left_runs, block_ids, run_dir)
+        right_runs = _merge_runs(right_runs, block_ids, run_dir)
+        left_sorted = merge(*(_iter_run(path, block_ids) for path in left_runs))
+        right_sorted = merge(*(_iter_run(path, block_ids) for path in right_runs))
+        try:
+            yield left_sorted, right_sorted
+        finally:
+            # Release the run files before the directory is removed
+            left_sorted.close()
+            right_sorted.close()
+
+
+def external_answers(
+    file_path, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, tmp_dir=None
+):
+    """Both parts for inputs larger than RAM, from one merge of the spilled runs."""
+    with _external_sorted_columns(file_path, max_memory_bytes, tmp_dir) as columns:
+        left_sorted, right_sorted = columns
+        # Tag each ID with its column in the low bit so one stream orders both
+        tagged_ids = merge(
+            (location_id << 1 for location_id in left_sorted),
+            (location_id << 1 | 1 for location_id in right_sorted),
+        )
+
+        total_distance = 0
+        similarity_score = 0
+        # Unpaired IDs seen so far, all from the column ``pending_side``
+        pending = pending_side = 0
+        current_id = None
+        counts = [0, 0]
+        for tagged_id in tagged_ids:
+            location_id, side = tagged_id >> 1, tagged_id & 1
+
+            # The k-th IDs of both columns pair up in stream order, so each pair
+            # adds its later ID and subtracts its earlier one
+            if pending and side != pending_side:
+                total_distance += location_id
+                pending -= 1
+            else:
+                total_distance -= location_id
+                pending += 1
+                pending_side = side
+
+            if location_id != current_id:
+                if current_id is not None:
+                    similarity_score += current_id * counts[0] * counts[1]
+                current_id = location_id
+                counts = [0, 0]
+            counts[side] += 1
+
+        if current_id is not None:
+            similarity_score += current_id * counts[0] * counts[1]
+        return total_distance, similarity_score
+
+
+def _write_random_input(rows):
+    import random
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file:
+        for _ in range(rows):
+            left = random.randrange(10000, 100000)
+            right = random.randrange(10000, 100000)
+            file.write(f"{left}   {right}\n")
+        return file.name
+
+
+def run_external_benchmark(rows, max_memory_bytes):
+    import time
+    import tracemalloc
+
+    path = _write_random_input(rows)
+    try:
+        left_array, right_array = read_input_arrays(path)
+        expected = (
+            calculate_total_distance(left_array, right_array),
+            calculate_similarity_score(left_array, right_array),
+        )
+        del left_array, right_array
+
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        result = external_answers(path, max_memory_bytes)
+        elapsed = time.perf_counter() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.remove(path)
+
+    print(
+        f"{rows} rows in {elapsed:.2f}s: peak {peak / 2**20:.2f} MiB "
+        f"of {max_memory_bytes / 2**20:.2f} MiB cap, "
+        f"{'matches' if result == expected else 'DIFFERS FROM'} in-memory result"
+    )
+
+
+def run_benchmark(sizes):
+    import time
+
+    for size in sizes:
+        path = _write_random_input(size)
+
+        try:
+            start_time = time.perf_counter()
+            left_list, right_list = read_input(path)
+            line_time = time.perf_counter() - start_time
+            del left_list, right_list
+
+            start_time = time.perf_counter()
+            left_array, right_array = read_input_arrays(path)
+            bulk_time = time.perf_counter() - start_time
+            del left_array, right_array
+        finally:
+            os.remove(path)
+
+        print(
+            f"{size:>10} rows: line loop {line_time:.3f}s, "
+            f"bulk arrays {bulk_time:.3f}s ({line_time / bulk_time:.1f}x)"
+        )
+
+
 # Example usage
 if __name__ == "__main__":
-    left_list, right_list = read_input("input/day1.txt")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Day 1: Historian Hysteria")
+    parser.add_argument(
+        "--benchmark", action="store_true", help="Benchmark the input loaders"
+    )
+    parser.add_argument(
+        "--sizes",
+        default="1000000,10000000,50000000",
+        help="Comma-separated row counts for --benchmark",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=float,
+        help="Use the external-sort mode with this memory cap in MiB",
+    )
+    parser.add_argument(
+        "--benchmark-external",
+        type=int,
+        metavar="ROWS",
+        help="Benchmark the external-sort mode on ROWS rows against --max-memory",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark([int(size) for size in args.sizes.split(",")])
+    elif args.benchmark_external:
+        max_memory = args.max_memory or DEFAULT_MAX_MEMORY_BYTES / 2**20
+        run_external_benchmark(args.benchmark_external, int(max_memory * 2**20))
+    elif args.max_memory:
+        total_distance, similarity_score = external_answers(
+            "input/day1.txt", int(args.max_memory * 2**20)
+        )
+        print(f"Part 1 - Total distance: {total_distance}")
+        print(f"Part 2 - Similarity score: {similarity_score}")
+    else:
+        left_list, right_list = read_input_arrays("input/day1.txt")
 
-    # Part 1
-    total_distance = calculate_total_distance(left_list, right_list)
-    print(f"Part 1 - Total distance: {total_distance}")
+        # Part 1
+        total_distance = calculate_total_distance(left_list, right_list)
+        print(f"Part 1 - Total distance: {total_distance}")
 
-    # Part 2
-    similarity_score = calculate_similarity_score(left_list, right_list)
-    print(f"Part 2 - Similarity score: {similarity_score}")
+        # Part 2
+        similarity_score = calculate_similarity_score(left_list, right_list)
+        print(f"Part 2 - Similarity score: {similarity_score}")
@@ -1,36 +1,196 @@
-from typing import List, Sequence
+import re
+from array import array
+from itertools import accumulate, islice, repeat
+from operator import add, sub
+from typing import List, NamedTuple, Sequence, Union
 
 
-def is_safe_report(levels: Sequence[int]) -> bool:
-    # Check if there are any duplicates
-    if len(set(levels)) != len(levels):
-        return False
+class ReportBatch(NamedTuple):
+    """All reports as one flat level array plus CSR-style row offsets.
 
-    # Get differences between adjacent numbers
-    diffs = [levels[i + 1] - levels[i] for i in range(len(levels) - 1)]
+    Report ``i`` is ``levels[offsets[i] : offsets[i + 1]]``.
+    """
 
-    # Check if all differences are in the same direction
-    if not (all(d > 0 for d in diffs) or all(d < 0 for d in diffs)):
-        return False
+    levels: array
+    offsets: array
 
-    # Check if differences are between 1 and 3 inclusive
-    return all(1 <= abs(d) <= 3 for d in diffs)
 
+# Step between two levels to code: u = safe rise, d = safe fall, x otherwise
+_STEP_CODES = {1: ord("u"), 2: ord("u"), 3: ord("u")}
+_STEP_CODES.update({-step: ord("d") for step in _STEP_CODES})
+_UNSAFE_CODE = ord("x")
 
-def is_safe_with_dampener(levels: Sequence[int]) -> bool:
-    # First check if it's already safe
-    if is_safe_report(levels):
+# Plain mode matches a report's step codes c0 c1 ... c(n-2), where ci codes
+# levels[i] -> levels[i + 1]
+_PLAIN_SAFE = re.compile(rb"u*|d*")
+# Dampened mode matches the interleaved codes c0 s0 c1 s1 ... c(n-2), where si
+# codes the step over the removed level levels[i + 1]
+_DAMPENED_SAFE = re.compile(
+    rb"(?:"
+    rb"(?:u.)*.u.(?:.u)*|.(?:.u)*|(?:u.)*."  # drop an inner, first or last level
+    rb"|(?:d.)*.d.(?:.d)*|.(?:.d)*|(?:d.)*."
+    rb")?",
+    re.DOTALL,
+)
+
+
+def _first_unsafe_step(levels: Sequence[int], direction: int) -> int:
+    # Index of the first adjacent pair whose step is not 1-3 in `direction`
+    for i in range(len(levels) - 1):
+        if not 1 <= (levels[i + 1] - levels[i]) * direction <= 3:
+            return i
+    return -1
+
+
+def _is_safe_without(
+    levels: Sequence[int], skip: int, direction: int, start: int = 0
+) -> bool:
+    # Check levels[start:] in `direction` as if levels[skip] were removed
+    previous = None
+    for i in range(start, len(levels)):
+        if i == skip:
+            continue
+        level = levels[i]
+        if previous is not None and not 1 <= (level - previous) * direction <= 3:
+            return False
+        previous = level
+    return True
+
+
+def is_safe_report(levels: Sequence[int]) -> bool:
+    if len(levels) < 2:
         return True
 
-    # Try removing each number one at a time
-    for i in range(len(levels)):
-        dampened_levels = levels[:i] + levels[i + 1 :]
-        if is_safe_report(dampened_levels):
+    # The first step fixes the direction; duplicates show up as a zero step
+    direction = 1 if levels[1] > levels[0] else -1
+    return _first_unsafe_step(levels, direction) == -1
+
+
+def is_safe_with_dampener(levels: Sequence[int]) -> bool:
+    for direction in (1, -1):
+        bad = _first_unsafe_step(levels, direction)
+        if bad == -1:
             return True
 
+        # Any removal outside the first bad pair leaves that pair adjacent,
+        # so only its two levels are worth dropping. Everything before
+        # bad - 1 is already known to be safe.
+        start = max(bad - 1, 0)
+        for skip in (bad, bad + 1):
+            if _is_safe_without(levels, skip, direction, start):
+                return True
+
     return False
 
 
+# Online checker flags, per direction (down is shifted by _DOWN_SHIFT):
+# _KEEP_ALL: every level so far kept, the last kept level is the newest one
+# _DROPPED: one earlier level removed, the last kept level is the newest one
+# _DROP_NEWEST: the newest level removed, the last kept level is the one before
+_KEEP_ALL, _DROPPED, _DROP_NEWEST = 1, 2, 4
+_DOWN_SHIFT = 3
+_HAS_PREVIOUS, _HAS_BEFORE = 64, 128
+_DIRECTION_BITS = _KEEP_ALL | _DROPPED | _DROP_NEWEST
+_FIRST_LEVEL_FLAGS = (_KEEP_ALL | _DROP_NEWEST) * (1 | 1 << _DOWN_SHIFT) | _HAS_PREVIOUS
+
+
+def _advance_flags(flags: int, previous: int, before: int, level: int) -> int:
+    # One O(1) step of the online checker; `previous` is the newest level so
+    # far and `before` the one ahead of it
+    if not flags & _HAS_PREVIOUS:
+        return _FIRST_LEVEL_FLAGS
+
+    advanced = _HAS_PREVIOUS | _HAS_BEFORE
+    for direction, shift in ((1, 0), (-1, _DOWN_SHIFT)):
+        bits = flags >> shift & _DIRECTION_BITS
+        step_ok = 1 <= (level - previous) * direction <= 3
+        skip_ok = bits & _DROP_NEWEST and (
+            not flags & _HAS_BEFORE or 1 <= (level - before) * direction <= 3
+        )
+
+        new_bits = 0
+        if bits & _KEEP_ALL:
+            # Dropping the new level keeps the all-kept prefix alive
+            new_bits |= _DROP_NEWEST
+            if step_ok:
+                new_bits |= _KEEP_ALL
+        if (bits & _DROPPED and step_ok) or skip_ok:
+            new_bits |= _DROPPED
+        advanced |= new_bits << shift
+    return advanced
+
+
+def _flags_safe(flags: int, use_dampener: bool) -> bool:
+    if not flags & _HAS_PREVIOUS:
+        return True
+    mask = _DIRECTION_BITS if use_dampener else _KEEP_ALL
+    return bool(flags & (mask | mask << _DOWN_SHIFT))
+
+
+class OnlineSafetyChecker:
+    """Incremental safety state for one live stream of levels.
+
+    Each pushed level costs O(1) and the state is three small integers, so
+    the answer is always current for both the plain and dampened rules.
+    """
+
+    __slots__ = ("_flags", "_previous", "_before")
+
+    def __init__(self) -> None:
+        self._flags = 0
+        self._previous = 0
+        self._before = 0
+
+    def push(self, level: int) -> None:
+        self._flags = _advance_flags(self._flags, self._previous, self._before, level)
+        self._before = self._previous
+        self._previous = level
+
+    @property
+    def is_safe(self) -> bool:
+        return _flags_safe(self._flags, use_dampener=False)
+
+    @property
+    def is_safe_with_dampener(self) -> bool:
+        return _flags_safe(self._flags, use_dampener=True)
+
+
+class OnlineSafetyPool:
+    """Online safety state for many concurrent streams, 17 bytes per stream.
+
+    Streams are numbered from 0 and stored column-wise in flat arrays instead
+    of one object each.
+    """
+
+    def __init__(self, stream_count: int = 0) -> None:
+        self._flags = bytearray(stream_count)
+        self._previous = array("q", bytes(8 * stream_count))
+        self._before = array("q", bytes(8 * stream_count))
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    def add_stream(self) -> int:
+        self._flags.append(0)
+        self._previous.append(0)
+        self._before.append(0)
+        return len(self._flags) - 1
+
+    def push(self, stream: int, level: int) -> None:
+        previous = self._previous[stream]
+        self._flags[stream] = _advance_flags(
+            self._flags[stream], previous, self._before[stream], level
+        )
+        self._before[stream] = previous
+        self._previous[stream] = level
+
+    def is_safe(self, stream: int, use_dampener: bool = False) -> bool:
+        return _flags_safe(self._flags[stream], use_dampener)
+
+    def count_safe(self, use_dampener: bool = False) -> int:
+        return sum(_flags_safe(flags, use_dampener) for flags in self._flags)
+
+
 def read_input(file_path: str) -> List[List[int]]:
     reports = []
     with open(file_path, "r") as file:
@@ -40,18 +200,123 @@ def read_input(file_path: str) -> List[List[int]]:
     return reports
 
 
-def count_safe_reports(reports: List[List[int]], use_dampener: bool = False) -> int:
+def read_input_batch(file_path: str) -> ReportBatch:
+    with open(file_path, "rb") as file:
+        lines = file.read().splitlines()
+    levels = array("q", map(int, b" ".join(lines).split()))
+    offsets = array("q", accumulate(map(len, map(bytes.split, lines)), initial=0))
+    return ReportBatch(levels, offsets)
+
+
+def _step_codes(levels: array, gap: int) -> bytes:
+    # Code levels[i + gap] - levels[i] for every i without a Python-level loop
+    steps = map(sub, islice(levels, gap, None), levels)
+    return bytes(map(_STEP_CODES.get, steps, repeat(_UNSAFE_CODE)))
+
+
+def safe_report_mask(batch: ReportBatch, use_dampener: bool = False) -> bytes:
+    """Return one byte per report: 1 if the report is safe, 0 otherwise."""
+    # Codes are prefixed with 2 * scale - 1 padding bytes so that the codes
+    # of a report spanning levels [start, stop) are [scale * start + pad,
+    # scale * stop); empty and single-level reports get empty slices.
+    if use_dampener:
+        size = len(batch.levels)
+        interleaved = bytearray(2 * size)
+        interleaved[0::2] = _step_codes(batch.levels, 1).ljust(size, b"x")
+        interleaved[1::2] = _step_codes(batch.levels, 2).ljust(size, b"x")
+        codes = b"xxx" + interleaved
+        scaled = array("q", map(add, batch.offsets, batch.offsets))
+        pattern, pad = _DAMPENED_SAFE, 3
+    else:
+        codes = b"x" + _step_codes(batch.levels, 1)
+        scaled = batch.offsets
+        pattern, pad = _PLAIN_SAFE, 1
+
+    starts = map(add, scaled, repeat(pad))
+    stops = islice(scaled, 1, None)
+    report_codes = map(codes.__getitem__, map(slice, starts, stops))
+    return bytes(map(bool, map(pattern.fullmatch, report_codes)))
+
+
+def count_safe_reports(
+    reports: Union[List[List[int]], ReportBatch], use_dampener: bool = False
+) -> int:
+    if isinstance(reports, ReportBatch):
+        return sum(safe_report_mask(reports, use_dampener))
     check_func = is_safe_with_dampener if use_dampener else is_safe_report
     return sum(1 for report in reports if check_func(report))
 
 
+def _is_safe_report_quadratic(levels: Sequence[int]) -> bool:
+    # Builds a set and a list of steps per report
+    if len(set(levels)) != len(levels):
+        return False
+    diffs = [levels[i + 1] - levels[i] for i in range(len(levels) - 1)]
+    if not (all(d > 0 for d in diffs) or all(d < 0 for d in diffs)):
+        return False
+    return all(1 <= abs(d) <= 3 for d in diffs)
+
+
+def _is_safe_with_dampener_quadratic(levels: Sequence[int]) -> bool:
+    # Re-checks the report once per removed level, so O(n^2) per report
+    if _is_safe_report_quadratic(levels):
+        return True
+    for i in range(len(levels)):
+        if _is_safe_report_quadratic(levels[:i] + levels[i + 1 :]):
+            return True
+    return False
+
+
+def run_benchmark(report_length: int, report_count: int) -> None:
+    import random
+    import time
+
+    reports = []
+    for _ in range(report_count):
+        levels = [0]
+        for _ in range(report_length - 1):
+            levels.append(levels[-1] + random.randint(1, 3))
+        # Break the report in one or two places so the dampener has work to do
+        for _ in range(random.randint(1, 2)):
+            levels[random.randrange(report_length)] += random.choice((-5, 5))
+        reports.append(levels)
+
+    for name, check_func in (
+        ("quadratic", _is_safe_with_dampener_quadratic),
+        ("linear", is_safe_with_dampener),
+    ):
+        start_time = time.perf_counter()
+        safe_count = sum(1 for report in reports if check_func(report))
+        elapsed = time.perf_counter() - start_time
+        print(f"{name:>9}: {safe_count} safe in {elapsed:.3f}s")
+
+
 if __name__ == "__main__":
-    reports = read_input("input/day2.txt")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Day 2: Red-Nosed Reports")
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="LEVELS",
+        help="Benchmark the dampener on reports with LEVELS levels each",
+    )
+    parser.add_argument(
+        "--reports", type=int, default=100, help="Report count for --benchmark"
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.reports)
+    else:
+        # The batch masks are no faster on short reports: their per-report slice
+        # and fullmatch cost about what the scalar checks do
+        reports = read_input("input/day2.txt")
 
-    # Part 1
-    safe_count = count_safe_reports(reports)
-    print(f"Part 1 - Number of safe reports: {safe_count}")
+        # Part 1
+        safe_count = count_safe_reports(reports)
+        print(f"Part 1 - Number of safe reports: {safe_count}")
 
-    # Part 2
-    safe_count_dampened = count_safe_reports(reports, use_dampener=True)
-    print(f"Part 2 - Number of safe reports with dampener: {safe_count_dampened}")
+        # Part 2
+        safe_count_dampened = count_safe_reports(reports, use_dampener=True)
+        print(f"Part 2 - Number of safe reports with dampener: {safe_count_dampened}")
@@ -1,55 +1,371 @@
+import os
 import re
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+from typing import AnyStr, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+# Quantifiers an instruction pattern may put after a single-character atom
+_QUANTIFIER = re.compile(r"[*+?]")
+_GROUP_OPEN = re.compile(r"\((?:\?:|\?P<\w+>)?")
 
-def extract_mul_instructions(corrupted_memory: str) -> List[int]:
-    # Use regex to find all valid mul instructions
-    pattern = r"mul\(\s*(\d+)\s*,\s*(\d+)\s*\)"
-    matches = re.findall(pattern, corrupted_memory)
 
-    # Calculate the results of the valid instructions
-    results = [int(x) * int(y) for x, y in matches]
-    return results
+def _prefix_pattern(pattern: str) -> str:
+    """Regex for the non-empty prefixes of the text ``pattern`` matches.
 
+    Only the syntax instruction patterns need is supported: literals,
+    escapes, character classes and ``*``, ``+`` or ``?`` after them, and
+    groups, which may not be quantified.
+    """
+    atoms = []
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "(":
+            position = _GROUP_OPEN.match(pattern, position).end()
+            continue
+        if char == ")":
+            position += 1
+            if _QUANTIFIER.match(pattern, position):
+                raise ValueError(f"Quantified group in {pattern!r}")
+            continue
+        if char in "|^$.*+?{":
+            raise ValueError(f"Unsupported {char!r} in {pattern!r}")
+        if char == "\\":
+            end = position + 2
+        elif char == "[":
+            end = pattern.index("]", position + 1) + 1
+        else:
+            end = position + 1
+        quantifier = _QUANTIFIER.match(pattern, end)
+        if quantifier:
+            end = quantifier.end()
+        atoms.append(pattern[position:end])
+        position = end
 
-def extract_enabled_mul_instructions(corrupted_memory: str) -> List[int]:
-    # Find all mul instructions and control statements in order
-    pattern = r"mul\(\s*(\d+)\s*,\s*(\d+)\s*\)|do\(\)|don\'t\(\)"
-    matches = list(re.finditer(pattern, corrupted_memory))
+    # a(?:b(?:c)?)? matches a, ab and abc
+    prefix = ""
+    for atom in reversed(atoms):
+        prefix = f"{atom}(?:{prefix})?" if prefix else atom
+    return prefix
+
+
+class InstructionLexer:
+    """Single-pass lexer for a set of instruction kinds.
+
+    Every kind is a name plus a regex whose groups capture its operands. All
+    kinds are compiled into one alternation, so adding a kind does not add a
+    pass over the input, and operands come straight from the match groups.
+    ``partial_bytes_pattern`` matches an instruction of any kind cut off by
+    the end of a byte buffer, for the streaming scanners.
+    """
+
+    def __init__(self, kinds: Sequence[Tuple[str, str]]) -> None:
+        alternatives = []
+        self.operand_slices = {}
+        group_count = 0
+        for name, pattern in kinds:
+            operand_count = re.compile(pattern).groups
+            # The kind is marked by an empty group at the end: a group around
+            # the whole alternative would defeat the engine's prefix search
+            alternatives.append(f"{pattern}(?P<{name}>)")
+            self.operand_slices[name] = slice(group_count, group_count + operand_count)
+            group_count += operand_count + 1
+
+        source = "|".join(alternatives)
+        self.pattern = re.compile(source)
+        self.bytes_pattern = re.compile(source.encode())
+        prefixes = "|".join(_prefix_pattern(pattern) for _, pattern in kinds)
+        self.partial_bytes_pattern = re.compile(rf"(?:{prefixes})\Z".encode())
+
+    def tokenize(self, text: AnyStr) -> Iterator[Tuple[str, Tuple[AnyStr, ...]]]:
+        """Yield ``(kind, operands)`` for every instruction in ``text``."""
+        pattern = self.pattern if isinstance(text, str) else self.bytes_pattern
+        operand_slices = self.operand_slices
+        for match in pattern.finditer(text):
+            kind = match.lastgroup
+            yield kind, match.groups()[operand_slices[kind]]
+
+
+INSTRUCTIONS = (
+    ("mul", r"mul\(\s*(\d+)\s*,\s*(\d+)\s*\)"),
+    ("do", r"do\(\)"),
+    ("dont", r"don't\(\)"),
+)
+LEXER = InstructionLexer(INSTRUCTIONS)
+
+
+def extract_mul_instructions(corrupted_memory: str) -> List[int]:
+    # Calculate the results of the valid mul instructions
+    return [
+        int(operands[0]) * int(operands[1])
+        for kind, operands in LEXER.tokenize(corrupted_memory)
+        if kind == "mul"
+    ]
 
+
+def extract_enabled_mul_instructions(corrupted_memory: str) -> List[int]:
+    mul_operands = LEXER.operand_slices["mul"]
     enabled = True  # Start with mul instructions enabled
     results = []
 
-    for match in matches:
-        instruction = match.group(0)
-        if instruction == "do()":
+    # Hot loop: read the lexer's matches directly rather than via tokenize()
+    for match in LEXER.pattern.finditer(corrupted_memory):
+        kind = match.lastgroup
+        if kind == "do":
             enabled = True
-        elif instruction == "don't()":
+        elif kind == "dont":
             enabled = False
-        else:
-            # Extract numbers from mul instruction if enabled
-            if enabled:
-                nums = re.findall(r"\d+", instruction)
-                if len(nums) == 2:
-                    results.append(int(nums[0]) * int(nums[1]))
+        elif kind == "mul" and enabled:
+            x, y = match.groups()[mul_operands]
+            results.append(int(x) * int(y))
 
     return results
 
 
+class EnabledMulScanner:
+    """Part 2 scanner that is fed the corrupted memory in byte chunks.
+
+    The enabled state and the running sum carry across chunks, and a token
+    cut by a chunk boundary is held back until the next chunk completes it.
+    A scanner started with ``enabled=None`` does not know its initial state;
+    it adds multiplications seen before the first control token to
+    ``unknown_total`` instead of ``total``.
+    """
+
+    def __init__(self, enabled: Optional[bool] = True) -> None:
+        self.enabled = enabled
+        self.total = 0
+        self.unknown_total = 0
+        self._carry = b""
+
+    def _apply(self, match: "re.Match[bytes]") -> None:
+        kind = match.lastgroup
+        if kind == "do":
+            self.enabled = True
+        elif kind == "dont":
+            self.enabled = False
+        elif kind == "mul" and self.enabled is not False:
+            x, y = match.groups()[LEXER.operand_slices["mul"]]
+            if self.enabled:
+                self.total += int(x) * int(y)
+            else:
+                self.unknown_total += int(x) * int(y)
+
+    def feed(self, chunk: bytes) -> None:
+        buffer = self._carry + chunk
+        end = 0
+        for match in LEXER.bytes_pattern.finditer(buffer):
+            self._apply(match)
+            end = match.end()
+
+        # Tokens never overlap, so only a prefix after the last match can grow
+        partial_token = LEXER.partial_bytes_pattern.search(buffer, end)
+        self._carry = buffer[partial_token.start() :] if partial_token else b""
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._carry)
+
+    def feed_overlap(self, chunk: bytes) -> None:
+        """Feed bytes past the end of this scanner's range.
+
+        Only the token already cut at the range end is completed; tokens that
+        start in the overlap belong to the next range.
+        """
+        buffer = self._carry + chunk
+        self._carry = b""
+        match = LEXER.bytes_pattern.match(buffer)
+        if match:
+            self._apply(match)
+        elif LEXER.partial_bytes_pattern.match(buffer):
+            self._carry = buffer
+
+
+def iter_enabled_mul_sums(file_path: str, chunk_size: int = 1 << 20) -> Iterator[int]:
+    """Yield the running sum of enabled multiplications after each chunk."""
+    scanner = EnabledMulScanner()
+    with open(file_path, "rb") as file:
+        for chunk in iter(partial(file.read, chunk_size), b""):
+            scanner.feed(chunk)
+            yield scanner.total
+
+
+def _scan_range(
+    file_path: str, start: int, stop: int, chunk_size: int = 1 << 20
+) -> Tuple[int, int, Optional[bool]]:
+    """Scan the tokens that start in bytes [start, stop) of the file.
+
+    Returns the sum if the range starts enabled, the sum if it starts
+    disabled, and the state after its last control token (None if it has
+    none).
+    """
+    scanner = EnabledMulScanner(enabled=None)
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        position = start
+        while position < stop:
+            chunk = file.read(min(chunk_size, stop - position))
+            if not chunk:
+                break
+            scanner.feed(chunk)
+            position += len(chunk)
+
+        # Overlap into the next range only as far as the cut token needs
+        overlap_size = 64
+        while scanner.pending:
+            chunk = file.read(overlap_size)
+            if not chunk:
+                break
+            scanner.feed_overlap(chunk)
+            overlap_size = min(2 * overlap_size, chunk_size)
+
+    return scanner.unknown_total + scanner.total, scanner.total, scanner.enabled
+
+
+def combine_range_sums(range_sums: Iterable[Tuple[int, int, Optional[bool]]]) -> int:
+    """Fold per-range results from _scan_range, in file order, into the answer."""
+    enabled = True
+    total = 0
+    for if_enabled, if_disabled, final_state in range_sums:
+        total += if_enabled if enabled else if_disabled
+        if final_state is not None:
+            enabled = final_state
+    return total
+
+
+def parallel_enabled_mul_sum(
+    file_path: str, workers: Optional[int] = None, range_size: Optional[int] = None
+) -> int:
+    """Part 2 over a process pool, one byte range of the file per task."""
+    file_size = os.path.getsize(file_path)
+    if range_size is None:
+        tasks = 4 * (workers or os.cpu_count() or 1)
+        range_size = max(1 << 20, -(-file_size // tasks))
+
+    starts = range(0, file_size, range_size)
+    stops = [min(start + range_size, file_size) for start in starts]
+    with ProcessPoolExecutor(workers) as executor:
+        range_sums = executor.map(_scan_range, repeat(file_path), starts, stops)
+        return combine_range_sums(range_sums)
+
+
 def read_input(file_path: str) -> str:
     with open(file_path, "r") as file:
         return file.read().strip()
 
 
+def _random_memory(size: int, density: float) -> str:
+    import random
+
+    instructions = ["mul(12,345)", "mul( 7 , 8 )", "do()", "don't()"]
+    noise = ["x", "mul(", "mul[3,7]", "do_", "don't", "(1,2)", "&", " ", "%$#"]
+    parts = []
+    length = 0
+    while length < size:
+        pool = instructions if random.random() < density else noise
+        part = random.choice(pool)
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+def _extract_enabled_mul_instructions_double_regex(corrupted_memory: str) -> List[int]:
+    # One regex finds the tokens, a second one re-parses each mul's operands
+    pattern = r"mul\(\s*(\d+)\s*,\s*(\d+)\s*\)|do\(\)|don\'t\(\)"
+    enabled = True
+    results = []
+    for match in list(re.finditer(pattern, corrupted_memory)):
+        instruction = match.group(0)
+        if instruction == "do()":
+            enabled = True
+        elif instruction == "don't()":
+            enabled = False
+        elif enabled:
+            nums = re.findall(r"\d+", instruction)
+            if len(nums) == 2:
+                results.append(int(nums[0]) * int(nums[1]))
+    return results
+
+
+def run_benchmark(sizes: List[int], densities: List[float]) -> None:
+    import time
+
+    for density in densities:
+        for size in sizes:
+            corrupted_memory = _random_memory(size, density)
+            timings = []
+            for extract in (
+                _extract_enabled_mul_instructions_double_regex,
+                extract_enabled_mul_instructions,
+            ):
+                start_time = time.perf_counter()
+                result = sum(extract(corrupted_memory))
+                timings.append(time.perf_counter() - start_time)
+            print(
+                f"density {density:.2f}, {size:>10} chars: double regex "
+                f"{timings[0]:.3f}s, lexer {timings[1]:.3f}s "
+                f"({timings[0] / timings[1]:.1f}x), sum {result}"
+            )
+
+
 if __name__ == "__main__":
-    corrupted_memory = read_input("input/day3.txt")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Day 3: Mull It Over")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Compute part 2 by streaming the input in fixed-size chunks",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=1 << 20, help="Chunk size in bytes"
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Benchmark the lexer against the double-regex extraction",
+    )
+    parser.add_argument(
+        "--sizes",
+        default="100000,1000000,10000000",
+        help="Comma-separated input sizes for --benchmark",
+    )
+    parser.add_argument(
+        "--densities",
+        default="0.05,0.25,0.75",
+        help="Comma-separated fractions of instruction tokens for --benchmark",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Compute part 2 by scanning byte ranges in this many processes",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(
+            [int(size) for size in args.sizes.split(",")],
+            [float(density) for density in args.densities.split(",")],
+        )
+    elif args.workers:
+        enabled_sum = parallel_enabled_mul_sum("input/day3.txt", args.workers)
+        print(f"Part 2 - Total sum of enabled multiplications: {enabled_sum}")
+    elif args.stream:
+        # Keep only the running sum after the last chunk
+        sums = deque(iter_enabled_mul_sums("input/day3.txt", args.chunk_size), maxlen=1)
+        enabled_sum = sums[0] if sums else 0
+        print(f"Part 2 - Total sum of enabled multiplications: {enabled_sum}")
+    else:
+        corrupted_memory = read_input("input/day3.txt")
 
-    # Part 1
-    results = extract_mul_instructions(corrupted_memory)
-    total_sum = sum(results)
-    print(f"Part 1 - Total sum of multiplications: {total_sum}")
+        # Part 1
+        results = extract_mul_instructions(corrupted_memory)
+        total_sum = sum(results)
+        print(f"Part 1 - Total sum of multiplications: {total_sum}")
 
-    # Part 2
-    enabled_results = extract_enabled_mul_instructions(corrupted_memory)
-    enabled_sum = sum(enabled_results)
-    print(f"Part 2 - Total sum of enabled multiplications: {enabled_sum}")
+        # Part 2
+        enabled_results = extract_enabled_mul_instructions(corrupted_memory)
+        enabled_sum = sum(enabled_results)
+        print(f"Part 2 - Total sum of enabled multiplications: {enabled_sum}")
@@ -1,4 +1,23 @@
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import shared_memory
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+# (row, col, d_row, d_col) of a word's first letter and its reading direction
+WordPosition = Tuple[int, int, int, int]
+
+DIRECTIONS = [(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]
 
 
 def read_input(file_path: str) -> List[str]:
@@ -12,7 +31,7 @@ def find_xmas(grid: List[str]) -> int:
     count = 0
 
     # All possible directions: right, down-right, down, down-left, left, up-left, up, up-right
-    directions = [(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]
+    directions = DIRECTIONS
 
     def check_direction(row: int, col: int, dx: int, dy: int) -> bool:
         """Check if 'XMAS' exists starting from (row, col) in direction (dx, dy)"""
@@ -37,7 +56,386 @@ def find_xmas(grid: List[str]) -> int:
     return count
 
 
+def letter_masks(flat: bytes, letters: Iterable[str]) -> Dict[str, int]:
+    """Bit ``p`` of ``masks[letter]`` is set when ``flat[p]`` is that letter."""
+    masks = {}
+    for letter in set(letters):
+        table = bytearray(b"0" * 256)
+        table[ord(letter)] = ord("1")
+        masks[letter] = int(flat.translate(table)[::-1], 2) if flat else 0
+    return masks
+
+
+def _shifted(mask: int, offset: int) -> int:
+    # Bit p of the result is bit p + offset of `mask`
+    return mask >> offset if offset >= 0 else mask << -offset
+
+
+def word_start_masks(rows: Sequence[bytes], word: str) -> Tuple[List[int], int]:
+    """Per direction, a mask of the cells where ``word`` starts.
+
+    Rows are flattened with ``len(word) - 1`` padding cells between them, so
+    a shifted mask never wraps a match from one row into the next; the flat
+    row stride is returned alongside the masks.
+    """
+    pad = len(word) - 1
+    stride = len(rows[0]) + pad
+    masks = letter_masks((b"\0" * pad).join(rows), word)
+
+    starts = []
+    for dr, dc in DIRECTIONS:
+        offset = dr * stride + dc
+        matches = masks[word[0]]
+        for i, letter in enumerate(word[1:], 1):
+            matches &= _shifted(masks[letter], i * offset)
+        starts.append(matches)
+    return starts, stride
+
+
+def find_word_bitmask(grid: List[str], word: str = "XMAS") -> int:
+    """Count ``word`` in all 8 directions using one bitmask per letter."""
+    if not grid or not word:
+        return 0
+    starts, _ = word_start_masks([row.encode() for row in grid], word)
+    return sum(bin(matches).count("1") for matches in starts)
+
+
+def find_xmas_bitmask(grid: List[str]) -> int:
+    return find_word_bitmask(grid, "XMAS")
+
+
+# Grid shared with the tile workers: (shared memory, height, width)
+_shared_grid: Optional[Tuple[shared_memory.SharedMemory, int, int]] = None
+
+# Counts the matches anchored in local rows [row_lo, row_hi) and columns
+# [col_lo, col_hi) of a tile read with its halo
+TileCounter = Callable[[List[bytes], int, int, int, int], int]
+
+
+def _attach_shared_grid(name: str, height: int, width: int) -> None:
+    global _shared_grid
+    _shared_grid = (shared_memory.SharedMemory(name=name), height, width)
+
+
+def _count_tile(
+    count_tile: TileCounter,
+    halo: int,
+    row_lo: int,
+    row_hi: int,
+    col_lo: int,
+    col_hi: int,
+) -> int:
+    grid, height, width = _shared_grid
+    top, bottom = max(row_lo - halo, 0), min(row_hi + halo, height)
+    left, right = max(col_lo - halo, 0), min(col_hi + halo, width)
+    rows = [
+        bytes(grid.buf[row * width + left : row * width + right])
+        for row in range(top, bottom)
+    ]
+    return count_tile(rows, row_lo - top, row_hi - top, col_lo - left, col_hi - left)
+
+
+def owned_mask(row_lo: int, row_hi: int, col_lo: int, col_hi: int, stride: int) -> int:
+    """Mask of the cells in rows [row_lo, row_hi) and columns [col_lo, col_hi)
+    of a flat grid with the given row stride."""
+    row = "0" * col_lo + "1" * (col_hi - col_lo) + "0" * (stride - col_hi)
+    return int(("0" * (row_lo * stride) + row * (row_hi - row_lo))[::-1], 2)
+
+
+def count_tiled(
+    grid: Sequence[Sequence[str]],
+    count_tile: TileCounter,
+    halo: int,
+    workers: Optional[int] = None,
+    tile_size: int = 1024,
+) -> int:
+    """Sum ``count_tile`` over square tiles of ``grid`` in a process pool.
+
+    The grid is copied once into shared memory. Each worker reads its tile
+    plus a ``halo`` of cells on every side and counts only the matches whose
+    anchor cell lies in the tile, so every match is counted exactly once.
+    """
+    rows = ["".join(row).encode() for row in grid]
+    height = len(rows)
+    width = len(rows[0]) if rows else 0
+    if not height or not width:
+        return 0
+
+    tiles = [
+        (top, min(top + tile_size, height), left, min(left + tile_size, width))
+        for top in range(0, height, tile_size)
+        for left in range(0, width, tile_size)
+    ]
+    grid_memory = shared_memory.SharedMemory(create=True, size=height * width)
+    try:
+        grid_memory.buf[: height * width] = b"".join(rows)
+        del rows
+        with ProcessPoolExecutor(
+            workers,
+            initializer=_attach_shared_grid,
+            initargs=(grid_memory.name, height, width),
+        ) as executor:
+            counts = executor.map(
+                _count_tile, repeat(count_tile), repeat(halo), *zip(*tiles)
+            )
+            return sum(counts)
+    finally:
+        grid_memory.close()
+        grid_memory.unlink()
+
+
+def _count_xmas_tile(
+    rows: List[bytes], row_lo: int, row_hi: int, col_lo: int, col_hi: int
+) -> int:
+    starts, stride = word_start_masks(rows, "XMAS")
+    owned = owned_mask(row_lo, row_hi, col_lo, col_hi, stride)
+    return sum(bin(matches & owned).count("1") for matches in starts)
+
+
+def find_xmas_parallel(
+    grid: List[str], workers: Optional[int] = None, tile_size: int = 1024
+) -> int:
+    """``find_xmas`` over tiles in a process pool; a match belongs to the tile
+    holding its X."""
+    return count_tiled(grid, _count_xmas_tile, len("XMAS") - 1, workers, tile_size)
+
+
+def stream_count_word(file_path: str, word: str = "XMAS") -> int:
+    """Count ``word`` in all 8 directions while the grid streams in by row.
+
+    Only the letter masks of the last ``len(word)`` rows are held, so memory
+    is O(width * len(word)) however tall the grid is. Upward and leftward
+    matches are counted as downward and rightward matches of the reversed
+    word.
+    """
+    if not word:
+        return 0
+    readings = (word, word[::-1])
+    window: Deque[Dict[str, int]] = deque(maxlen=len(word))
+    count = 0
+
+    with open(file_path, "rb") as file:
+        for line in file:
+            row = line.strip()
+            if not row:
+                continue
+            masks = letter_masks(row, word)
+            window.append(masks)
+
+            for reading in readings:
+                # Horizontal: bit c of the shifted mask is column c + i
+                matches = masks[reading[0]]
+                for i, letter in enumerate(reading[1:], 1):
+                    matches &= masks[letter] >> i
+                count += bin(matches).count("1")
+
+                # Vertical and diagonals that end in this row
+                if len(window) == len(word):
+                    for dc in (0, 1, -1):
+                        matches = window[0][reading[0]]
+                        for i, letter in enumerate(reading[1:], 1):
+                            matches &= _shifted(window[i][letter], i * dc)
+                        count += bin(matches).count("1")
+
+    return count
+
+
+class AhoCorasick:
+    """Automaton that finds every occurrence of many words in one scan."""
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self.words = list(dict.fromkeys(words))
+        # Trie nodes: child transitions, failure link and matched word indexes
+        self._children: List[Dict[str, int]] = [{}]
+        self._fail = [0]
+        self._outputs: List[List[int]] = [[]]
+
+        for index, word in enumerate(self.words):
+            node = 0
+            for char in word:
+                next_node = self._children[node].get(char)
+                if next_node is None:
+                    next_node = len(self._children)
+                    self._children[node][char] = next_node
+                    self._children.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                node = next_node
+            self._outputs[node].append(index)
+
+        # Breadth-first failure links; outputs inherit their fallback's words
+        queue = deque(self._children[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._children[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._children[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._children[fallback].get(char, 0)
+                self._fail[child] = target
+                self._outputs[child] = self._outputs[child] + self._outputs[target]
+
+    def iter_matches(self, text: Sequence[str]) -> Iterator[Tuple[int, int]]:
+        """Yield ``(end_index, word_index)`` for every match in ``text``."""
+        children, fail, outputs = self._children, self._fail, self._outputs
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in children[node]:
+                node = fail[node]
+            node = children[node].get(char, 0)
+            for word_index in outputs[node]:
+                yield position, word_index
+
+
+def grid_lines(grid: List[str]) -> Iterator[Tuple[str, int, int, int, int]]:
+    """Yield every row, column and diagonal once as ``(line, row, col, dr, dc)``.
+
+    ``(row, col)`` is the cell of the line's first character and ``(dr, dc)``
+    the step between consecutive characters.
+    """
+    rows = len(grid)
+    cols = len(grid[0]) if rows else 0
+
+    for r in range(rows):
+        yield grid[r], r, 0, 0, 1
+    for c in range(cols):
+        yield "".join(grid[r][c] for r in range(rows)), 0, c, 1, 0
+    # Down-right diagonals start on the top row or the left column
+    for r, c in [(0, c) for c in range(cols)] + [(r, 0) for r in range(1, rows)]:
+        length = min(rows - r, cols - c)
+        yield "".join(grid[r + i][c + i] for i in range(length)), r, c, 1, 1
+    # Down-left diagonals start on the top row or the right column
+    for r, c in [(0, c) for c in range(cols)] + [(r, cols - 1) for r in range(1, rows)]:
+        length = min(rows - r, c + 1)
+        yield "".join(grid[r + i][c - i] for i in range(length)), r, c, 1, -1
+
+
+def find_word_positions(
+    grid: List[str], words: Iterable[str]
+) -> Dict[str, List[WordPosition]]:
+    """Find every word in all 8 directions with one automaton pass per line.
+
+    Each line is scanned forwards and backwards, so a palindrome is reported
+    once per direction, just like ``find_xmas`` counts it.
+    """
+    automaton = AhoCorasick(words)
+    positions: Dict[str, List[WordPosition]] = {word: [] for word in automaton.words}
+    lengths = [len(word) for word in automaton.words]
+
+    for line, row, col, dr, dc in grid_lines(grid):
+        for end, word_index in automaton.iter_matches(line):
+            start = end - lengths[word_index] + 1
+            positions[automaton.words[word_index]].append(
+                (row + start * dr, col + start * dc, dr, dc)
+            )
+        last = len(line) - 1
+        for end, word_index in automaton.iter_matches(line[::-1]):
+            # Index `end` of the reversed line is index `last - end` forwards
+            start = last - (end - lengths[word_index] + 1)
+            positions[automaton.words[word_index]].append(
+                (row + start * dr, col + start * dc, -dr, -dc)
+            )
+
+    return positions
+
+
+def count_words(grid: List[str], words: Iterable[str]) -> Dict[str, int]:
+    return {
+        word: len(found) for word, found in find_word_positions(grid, words).items()
+    }
+
+
+def random_grid(size: int, letters: str = "XMAS") -> List[str]:
+    import random
+
+    return ["".join(random.choices(letters, k=size)) for _ in range(size)]
+
+
+def run_benchmark(sizes: List[int], baseline_max: int) -> None:
+    import time
+
+    for size in sizes:
+        grid = random_grid(size)
+        start_time = time.perf_counter()
+        count = find_xmas_bitmask(grid)
+        bitmask_time = time.perf_counter() - start_time
+
+        if size <= baseline_max:
+            start_time = time.perf_counter()
+            assert find_xmas(grid) == count
+            baseline = f"cell loop {time.perf_counter() - start_time:.3f}s"
+        else:
+            baseline = "cell loop skipped"
+        print(f"{size:>6}x{size:<6} {baseline}, bitmask {bitmask_time:.3f}s")
+
+
+def run_parallel_benchmark(size: int, worker_counts: List[int], tile_size: int) -> None:
+    import time
+
+    grid = random_grid(size)
+    expected = find_xmas_bitmask(grid)
+    baseline = None
+    for workers in worker_counts:
+        start_time = time.perf_counter()
+        assert find_xmas_parallel(grid, workers, tile_size) == expected
+        elapsed = time.perf_counter() - start_time
+        baseline = baseline or elapsed
+        print(
+            f"{size}x{size}, {workers} workers: {elapsed:.3f}s "
+            f"({baseline / elapsed:.2f}x vs {worker_counts[0]} workers)"
+        )
+
+
 if __name__ == "__main__":
-    grid = read_input("input/day4.txt")
-    xmas_count = find_xmas(grid)
-    print(f"Number of XMAS occurrences: {xmas_count}")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Day 4: Ceres Search")
+    parser.add_argument(
+        "--benchmark", action="store_true", help="Benchmark the XMAS counters"
+    )
+    parser.add_argument(
+        "--sizes",
+        default="140,1000,5000,20000",
+        help="Comma-separated grid sizes for --benchmark",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Count while streaming the grid row by row with bounded memory",
+    )
+    parser.add_argument(
+        "--baseline-max",
+        type=int,
+        default=1000,
+        help="Largest grid size also timed with the original cell loop",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Count tiles of the grid in this many processes"
+    )
+    parser.add_argument(
+        "--tile-size", type=int, default=1024, help="Tile side for --workers"
+    )
+    parser.add_argument(
+        "--benchmark-parallel",
+        type=int,
+        metavar="SIZE",
+        help="Time --workers 1, 2, 4 and 8 on a random SIZE x SIZE grid",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark([int(size) for size in args.sizes.split(",")], args.baseline_max)
+    elif args.benchmark_parallel:
+        run_parallel_benchmark(args.benchmark_parallel, [1, 2, 4, 8], args.tile_size)
+    elif args.workers:
+        grid = read_input("input/day4.txt")
+        xmas_count = find_xmas_parallel(grid, args.workers, args.tile_size)
+        print(f"Number of XMAS occurrences: {xmas_count}")
+    elif args.stream:
+        xmas_count = stream_count_word("input/day4.txt")
+        print(f"Number of XMAS occurrences: {xmas_count}")
+    else:
+        grid = read_input("input/day4.txt")
+        xmas_count = find_xmas_bitmask(grid)
+        print(f"Number of XMAS occurrences: {xmas_count}")
@@ -1,3 +1,24 @@
+from collections import deque
+from functools import reduce
+from itertools import repeat
+from operator import add, eq, mod, mul
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from day04_part1 import count_tiled, letter_masks, owned_mask
+
+# Templates are tuples of equal-length rows; WILDCARD cells match anything
+Template = Tuple[str, ...]
+WILDCARD = "."
+X_MAS_TEMPLATE: Template = ("M.S", ".A.", "M.S")
+
+# Rabin-Karp parameters; BASE exceeds every byte value, so windows of up to
+# seven cells hash without collisions
+HASH_BASE = 257
+HASH_MOD = (1 << 61) - 1
+# Turns a bytes object of 0/1 flags into "0"/"1" digits
+_FLAG_DIGITS = bytes.maketrans(b"\0\1", b"01")
+
+
 def read_grid(filename):
     with open(filename) as f:
         return [list(line.strip()) for line in f]
@@ -46,11 +67,296 @@ def count_xmas_patterns(grid):
     return count
 
 
+def cross_centre_mask(rows: Sequence[bytes]) -> Tuple[int, int]:
+    """Mask of the A cells centring an X-MAS cross, plus the flat row stride.
+
+    Rows are flattened with one padding cell between them, so the diagonal
+    neighbours of an edge cell never wrap into the next row.
+    """
+    stride = len(rows[0]) + 1
+    masks = letter_masks(b"\0".join(rows), "MAS")
+    m, a, s = masks["M"], masks["A"], masks["S"]
+
+    # Bit p of (mask << k) is cell p - k and of (mask >> k) is cell p + k
+    down_right = stride + 1  # top-left to bottom-right diagonal
+    down_left = stride - 1  # top-right to bottom-left diagonal
+    crosses = a
+    for offset in (down_right, down_left):
+        crosses &= (m << offset) & (s >> offset) | (s << offset) & (m >> offset)
+    return crosses, stride
+
+
+def count_xmas_patterns_bitmask(grid: List[List[str]]) -> int:
+    """Count X-MAS crosses with one bitmask per letter instead of a cell loop."""
+    if not grid:
+        return 0
+    crosses, _ = cross_centre_mask(["".join(row).encode() for row in grid])
+    return bin(crosses).count("1")
+
+
+def _count_xmas_tile(
+    rows: List[bytes], row_lo: int, row_hi: int, col_lo: int, col_hi: int
+) -> int:
+    crosses, stride = cross_centre_mask(rows)
+    return bin(crosses & owned_mask(row_lo, row_hi, col_lo, col_hi, stride)).count("1")
+
+
+def count_xmas_patterns_parallel(
+    grid: List[List[str]], workers: Optional[int] = None, tile_size: int = 1024
+) -> int:
+    """``count_xmas_patterns`` over tiles in a process pool; a cross belongs
+    to the tile holding its A."""
+    return count_tiled(grid, _count_xmas_tile, 1, workers, tile_size)
+
+
+def stream_count_xmas_patterns(file_path: str) -> int:
+    """Count X-MAS crosses while the grid streams in row by row.
+
+    Only the letter masks of the last three rows are held; each new row
+    completes the crosses centred on the row before it.
+    """
+    window: Deque[Dict[str, int]] = deque(maxlen=3)
+    count = 0
+
+    with open(file_path, "rb") as file:
+        for line in file:
+            row = line.strip()
+            if not row:
+                continue
+            window.append(letter_masks(row, "MAS"))
+            if len(window) < 3:
+                continue
+
+            top, middle, bottom = window
+            top_m, top_s = top["M"], top["S"]
+            bottom_m, bottom_s = bottom["M"], bottom["S"]
+            # Bit c of (mask << 1) is column c - 1 and of (mask >> 1) is c + 1
+            down_right = (top_m << 1) & (bottom_s >> 1) | (top_s << 1) & (bottom_m >> 1)
+            down_left = (top_m >> 1) & (bottom_s << 1) | (top_s >> 1) & (bottom_m << 1)
+            crosses = middle["A"] & down_right & down_left
+            count += bin(crosses).count("1")
+
+    return count
+
+
+def template_variants(template: Template) -> List[Template]:
+    """Distinct rotations and reflections of ``template``."""
+    variants = []
+    current = tuple(template)
+    for _ in range(4):
+        for variant in (current, tuple(row[::-1] for row in current)):
+            if variant not in variants:
+                variants.append(variant)
+        # Rotate a quarter turn clockwise
+        current = tuple("".join(column) for column in zip(*reversed(current)))
+    return variants
+
+
+def _extend_hash(prefix_hash: int, cell: int) -> int:
+    return (prefix_hash * HASH_BASE + cell) % HASH_MOD
+
+
+def _bits(flags: bytes) -> int:
+    # Bit i is set when flags[i] is true
+    return int(flags.translate(_FLAG_DIGITS)[::-1], 2) if flags else 0
+
+
+def _run_bits(row: bytes, row_hashes: List[int], run: bytes, run_hash: int) -> int:
+    # Bit i is set when ``run`` starts at row[i]
+    flags = bytearray(map(eq, row_hashes, repeat(run_hash)))
+    if HASH_BASE ** len(run) < HASH_MOD:
+        # Short windows never wrap around HASH_MOD, so their hashes are exact
+        return _bits(flags)
+    # Longer runs can collide, so every hit is confirmed against the cells
+    hit = flags.find(1)
+    while hit != -1:
+        if not row.startswith(run, hit):
+            flags[hit] = 0
+        hit = flags.find(1, hit + 1)
+    return _bits(flags)
+
+
+class TemplateMatcher:
+    """Counts 2D templates with wildcard cells in one grid.
+
+    Every template row is split into runs of fixed cells. Rows are searched
+    with Rabin-Karp: the rolling hashes for each run length are computed
+    once per grid and shared by all templates, and their hits, checked
+    against the cells, give a bitmask of the columns where each template row
+    matches. The columns pass then ANDs those bitmasks down each window of
+    template rows. The cost per template is linear in the grid size times
+    its number of runs, plus one comparison per hash hit on runs long
+    enough for their hashes to collide.
+    """
+
+    def __init__(self, grid: Sequence[Sequence[str]]) -> None:
+        self.rows = ["".join(row).encode() for row in grid]
+        self.height = len(self.rows)
+        self.width = len(self.rows[0]) if self.rows else 0
+        self._window_hashes: Dict[int, List[List[int]]] = {}
+        self._row_masks: Dict[str, List[int]] = {}
+
+    def window_hashes(self, length: int) -> List[List[int]]:
+        """Hash of every ``length``-cell window of every row.
+
+        Windows grow one cell at a time, h(i, n + 1) = h(i, n) * base +
+        row[i + n], so every step is a C-level pass over the row.
+        """
+        if length not in self._window_hashes:
+            if length == 1:
+                hashes = [list(row) for row in self.rows]
+            else:
+                shorter = self.window_hashes(length - 1)
+                hashes = []
+                for row, row_hashes in zip(self.rows, shorter):
+                    scaled = map(mul, row_hashes, repeat(HASH_BASE))
+                    extended = map(add, scaled, row[length - 1 :])
+                    hashes.append(list(map(mod, extended, repeat(HASH_MOD))))
+            self._window_hashes[length] = hashes
+        return self._window_hashes[length]
+
+    def row_masks(self, pattern: str) -> List[int]:
+        """Per grid row, a bitmask of the columns where ``pattern`` starts."""
+        if pattern not in self._row_masks:
+            anchors = max(self.width - len(pattern) + 1, 0)
+            masks = [(1 << anchors) - 1] * self.height
+            start = None
+            for i, cell in enumerate(pattern + WILDCARD):
+                if cell != WILDCARD and start is None:
+                    start = i
+                elif cell == WILDCARD and start is not None:
+                    run = pattern[start:i].encode()
+                    run_hash = reduce(_extend_hash, run, 0)
+                    hashes = self.window_hashes(len(run))
+                    masks = [
+                        mask & _run_bits(row, row_hashes, run, run_hash) >> start
+                        for mask, row, row_hashes in zip(masks, self.rows, hashes)
+                    ]
+                    start = None
+            self._row_masks[pattern] = masks
+        return self._row_masks[pattern]
+
+    def match_masks(self, template: Template) -> List[int]:
+        """Per anchor row, a bitmask of the columns where ``template`` matches."""
+        anchor_rows = max(self.height - len(template) + 1, 0)
+        matches = [-1] * anchor_rows
+        for offset, pattern in enumerate(template):
+            masks = self.row_masks(pattern)
+            matches = [match & masks[row + offset] for row, match in enumerate(matches)]
+        return matches
+
+    def count(self, template: Template, variants: bool = True) -> int:
+        """Count matches of ``template``, or of all its distinct rotations and
+        reflections when ``variants`` is set."""
+        templates = template_variants(template) if variants else [template]
+        return sum(
+            bin(mask).count("1")
+            for variant in templates
+            for mask in self.match_masks(variant)
+        )
+
+
+def count_xmas_patterns_templated(grid: List[List[str]]) -> int:
+    return TemplateMatcher(grid).count(X_MAS_TEMPLATE)
+
+
+def run_benchmark(sizes: List[int], baseline_max: int) -> None:
+    import random
+    import time
+
+    for size in sizes:
+        grid = [random.choices("XMAS", k=size) for _ in range(size)]
+        start_time = time.perf_counter()
+        count = count_xmas_patterns_bitmask(grid)
+        bitmask_time = time.perf_counter() - start_time
+
+        # The templated and cell-loop counters are too slow for the big grids
+        if size <= baseline_max:
+            start_time = time.perf_counter()
+            assert count_xmas_patterns_templated(grid) == count
+            template = f"template {time.perf_counter() - start_time:.3f}s"
+            start_time = time.perf_counter()
+            assert count_xmas_patterns(grid) == count
+            baseline = f"cell loop {time.perf_counter() - start_time:.3f}s"
+        else:
+            template = "template skipped"
+            baseline = "cell loop skipped"
+        print(
+            f"{size:>6}x{size:<6} {baseline}, bitmask {bitmask_time:.3f}s, {template}"
+        )
+
+
+def run_parallel_benchmark(size: int, worker_counts: List[int], tile_size: int) -> None:
+    import random
+    import time
+
+    grid = [random.choices("XMAS", k=size) for _ in range(size)]
+    expected = count_xmas_patterns_bitmask(grid)
+    baseline = None
+    for workers in worker_counts:
+        start_time = time.perf_counter()
+        assert count_xmas_patterns_parallel(grid, workers, tile_size) == expected
+        elapsed = time.perf_counter() - start_time
+        baseline = baseline or elapsed
+        print(
+            f"{size}x{size}, {workers} workers: {elapsed:.3f}s "
+            f"({baseline / elapsed:.2f}x vs {worker_counts[0]} workers)"
+        )
+
+
 def main():
     grid = read_grid("input/day4.txt")
-    result = count_xmas_patterns(grid)
+    result = count_xmas_patterns_bitmask(grid)
     print(f"Number of X-MAS patterns: {result}")
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Day 4: Ceres Search - Part 2")
+    parser.add_argument(
+        "--benchmark", action="store_true", help="Benchmark the X-MAS counters"
+    )
+    parser.add_argument(
+        "--sizes",
+        default="140,1000,5000,20000",
+        help="Comma-separated grid sizes for --benchmark",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Count while streaming the grid row by row with bounded memory",
+    )
+    parser.add_argument(
+        "--baseline-max",
+        type=int,
+        default=1000,
+        help="Largest grid size also timed with the template and cell loop",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Count tiles of the grid in this many processes"
+    )
+    parser.add_argument(
+        "--tile-size", type=int, default=1024, help="Tile side for --workers"
+    )
+    parser.add_argument(
+        "--benchmark-parallel",
+        type=int,
+        metavar="SIZE",
+        help="Time --workers 1, 2, 4 and 8 on a random SIZE x SIZE grid",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark([int(size) for size in args.sizes.split(",")], args.baseline_max)
+    elif args.benchmark_parallel:
+        run_parallel_benchmark(args.benchmark_parallel, [1, 2, 4, 8], args.tile_size)
+    elif args.workers:
+        grid = read_grid("input/day4.txt")
+        result = count_xmas_patterns_parallel(grid, args.workers, args.tile_size)
+        print(f"Number of X-MAS patterns: {result}")
+    elif args.stream:
+        result = stream_count_xmas_patterns("input/day4.txt")
+        print(f"Number of X-MAS patterns: {result}")
+    else:
+        main()
@@ -1,6 +1,8 @@
 from typing import List, Set, Tuple
 from collections import deque
 
+from grid import Grid
+
 
 def read_input(file_path: str) -> List[List[int]]:
     """Read and parse the input file into a 2D grid of heights."""
@@ -123,10 +125,70 @@ def solve_part1(grid: List[List[int]], debug: bool = False) -> int:
     return total_score
 
 
+def score_trailheads(grid: Grid) -> int:
+    """Part 1 on a flat Grid of height digits, climbing one level at a time.
+
+    The border and '.' cells never equal the next height, so no bounds or
+    impassable checks are needed.
+    """
+    cells = grid.cells
+    offsets = grid.offsets
+    total_score = 0
+    for trailhead in grid.find_all(ord('0')):
+        frontier = {trailhead}
+        for height in range(ord('1'), ord('9') + 1):
+            frontier = {
+                pos + offset
+                for pos in frontier
+                for offset in offsets
+                if cells[pos + offset] == height
+            }
+        total_score += len(frontier)
+    return total_score
+
+
+def run_benchmark(size: int) -> None:
+    import os
+    import random
+    import tempfile
+    import time
+    import tracemalloc
+
+    # Diagonal ramps, height (x + y) % 10, give every trailhead trails to
+    # climb; impassable '.' cells knock out some of them
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        for y in range(size):
+            row = ('.' if random.random() < 0.1 else str((x + y) % 10)
+                   for x in range(size))
+            f.write(''.join(row) + '\n')
+    try:
+        for name, load, solve in (
+            ('nested lists', read_input, solve_part1),
+            ('flat Grid', Grid.from_file, score_trailheads),
+        ):
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            grid = load(f.name)
+            load_time = time.perf_counter() - start_time
+            grid_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            start_time = time.perf_counter()
+            result = solve(grid)
+            solve_time = time.perf_counter() - start_time
+            print(f"{name:>12}: {grid_bytes / 2**20:.1f} MiB, load {load_time:.3f}s, "
+                  f"solve {solve_time:.3f}s, score {result}")
+            del grid
+    finally:
+        os.remove(f.name)
+
+
 def main(file_path: str, debug: bool = False) -> int:
     """Main function to solve the puzzle."""
-    grid = read_input(file_path)
-    result = solve_part1(grid, debug)
+    if debug:
+        result = solve_part1(read_input(file_path), debug)
+    else:
+        result = score_trailheads(Grid.from_file(file_path))
     print(f"\nSum of trailhead scores: {result}")
     return result
 
@@ -135,7 +197,12 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='Day 10: Hoof It')
     parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    parser.add_argument('--benchmark', type=int, metavar='SIZE',
+                        help='Time nested lists and Grid on a SIZE x SIZE trail map')
     args = parser.parse_args()
 
-    result = main("input/day10.txt", args.debug)
-    print(f"\nFinal answer: {result}")
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+    else:
+        result = main("input/day10.txt", args.debug)
+        print(f"\nFinal answer: {result}")
@@ -1,6 +1,8 @@
 from typing import List, Set, Tuple, Dict
 from collections import deque, defaultdict
 
+from grid import Grid
+
 
 def read_input(file_path: str) -> List[List[int]]:
     """Read and parse the input file into a 2D grid of heights."""
@@ -118,16 +120,34 @@ def solve_part2(grid: List[List[int]], debug: bool = False) -> int:
     return total_rating
 
 
+def rate_trailheads(grid: Grid) -> int:
+    """Part 2 on a flat Grid: carry path counts up one height level at a time.
+
+    Paths from every trailhead are counted together, since only the total
+    number of distinct trails matters.
+    """
+    cells = grid.cells
+    offsets = grid.offsets
+    paths = dict.fromkeys(grid.find_all(ord('0')), 1)
+    for height in range(ord('1'), ord('9') + 1):
+        next_paths: Dict[int, int] = defaultdict(int)
+        for pos, count in paths.items():
+            for offset in offsets:
+                if cells[pos + offset] == height:
+                    next_paths[pos + offset] += count
+        paths = next_paths
+    return sum(paths.values())
+
+
 def main(file_path: str, debug: bool = False) -> int:
     """Main function to solve the puzzle."""
     import time
     start_time = time.time()
 
-    # Parse input
-    grid = read_input(file_path)
-
-    # Solve part 2
-    result = solve_part2(grid, debug)
+    if debug:
+        result = solve_part2(read_input(file_path), debug)
+    else:
+        result = rate_trailheads(Grid.from_file(file_path))
 
     end_time = time.time()
     print(f"\nSum of trailhead ratings: {result}")
@@ -1,5 +1,55 @@
-from collections import defaultdict
-from typing import Dict, List, Tuple
+from array import array
+from collections import defaultdict, deque
+from functools import cmp_to_key
+from itertools import accumulate, chain, combinations, compress, islice, repeat
+from operator import (
+    add,
+    and_,
+    eq,
+    floordiv,
+    lshift,
+    methodcaller,
+    mul,
+    not_,
+    or_,
+    sub,
+)
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+# (before, after) page pairs, one per rule
+PairIndex = Set[Tuple[int, int]]
+
+# Rule matrix codes for an ordered page pair (a, b)
+_UNRELATED, _BEFORE, _AFTER, _CONFLICT = 0, 1, 2, 3
+# Turn a matrix row into "0"/"1" digits, "1" where the rule code is _BEFORE,
+# or for _RULE_DIGITS where it has the _BEFORE bit, _CONFLICT included
+_BEFORE_DIGITS = bytes(ord("1" if code == _BEFORE else "0") for code in range(256))
+_RULE_DIGITS = bytes(ord("1" if code & _BEFORE else "0") for code in range(256))
+_COUNT_ONES = methodcaller("count", "1")
+
+
+class UpdateBatch(NamedTuple):
+    """All updates packed row by row into one padded page array.
+
+    Update ``i`` is ``pages[i * stride : i * stride + lengths[i]]``; the rest
+    of its row, at least one cell, holds the page ``pad``, which no rule
+    mentions.
+    """
+
+    pages: array
+    lengths: array
+    stride: int
+    pad: int
 
 
 def read_input(file_path: str) -> Tuple[List[str], List[List[int]]]:
@@ -41,8 +91,374 @@ def find_middle_page(update: List[int]) -> int:
     return update[len(update) // 2]
 
 
+class OrderingCycleError(ValueError):
+    """The rules among an update's pages contain a cycle, so no order exists.
+
+    ``components`` lists the strongly connected components that make up
+    the cycles, each as a list of pages.
+    """
+
+    def __init__(self, components: List[List[int]]) -> None:
+        self.components = components
+        super().__init__(f"Ordering rules form cycles among pages: {components}")
+
+
+def _pop_component(stack: List[int], on_stack: Set[int], root: int) -> List[int]:
+    # Pop the component rooted at ``root`` off the Tarjan stack, in push order
+    component = []
+    while True:
+        member = stack.pop()
+        on_stack.discard(member)
+        component.append(member)
+        if member == root:
+            return component[::-1]
+
+
+def _cyclic_components(
+    pages: Iterable[int], successors: Callable[[int], List[int]]
+) -> List[List[int]]:
+    # Iterative Tarjan; keeps only the components that contain a cycle
+    index: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    stack: List[int] = []
+    on_stack: Set[int] = set()
+    components = []
+
+    for root in pages:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            page, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors(child))))
+                    break
+                if child in on_stack:
+                    low[page] = min(low[page], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[page])
+                if low[page] == index[page]:
+                    component = _pop_component(stack, on_stack, page)
+                    if len(component) > 1 or page in successors(page):
+                        components.append(component)
+    return components
+
+
+class PageReorderer:
+    """Kahn's algorithm over the rules restricted to one update at a time.
+
+    Each update costs O(V + E) for its pages and the rules among them, with
+    no recursion, and the working buffers are reused from one update to the
+    next.
+    """
+
+    def __init__(self, rules: Dict[int, set]) -> None:
+        self.rules = rules
+        self._successors: Dict[int, set] = {}
+        self._indegree: Dict[int, int] = {}
+        self._ready: Deque[int] = deque()
+
+    def reorder(self, update: List[int]) -> List[int]:
+        rules = self.rules
+        pages = set(update)
+        # set & set walks the smaller side, so a page with many rules costs
+        # no more than the update's size
+        successors = self._successors
+        successors.clear()
+        successors.update(
+            (page, rules[page] & pages) for page in pages if page in rules
+        )
+        indegree = self._indegree
+        indegree.clear()
+        indegree.update(dict.fromkeys(update, 0))
+        for afters in successors.values():
+            for after in afters:
+                indegree[after] += 1
+
+        # Pages become ready in update order, so ties keep their order
+        ready = self._ready
+        ready.clear()
+        ready.extend(page for page, count in indegree.items() if not count)
+        result = []
+        while ready:
+            page = ready.popleft()
+            result.append(page)
+            for after in successors.get(page, ()):
+                indegree[after] -= 1
+                if not indegree[after]:
+                    ready.append(after)
+
+        if len(result) < len(indegree):
+            raise OrderingCycleError(self._cycles())
+        return result
+
+    def _cycles(self) -> List[List[int]]:
+        # Kahn's algorithm leaves exactly the pages on or behind a cycle
+        remaining = {page for page, count in self._indegree.items() if count}
+        successors = self._successors
+
+        def remaining_successors(page: int) -> List[int]:
+            return [after for after in successors.get(page, ()) if after in remaining]
+
+        return _cyclic_components(remaining, remaining_successors)
+
+
 def reorder_update(update: List[int], rules: Dict[int, set]) -> List[int]:
-    # Create a graph of dependencies
+    """Order an update by the rules; raises OrderingCycleError on cycles."""
+    return PageReorderer(rules).reorder(update)
+
+
+def build_pair_index(rules: Dict[int, set]) -> PairIndex:
+    # Flatten build_rules() once so every rule lookup is one set probe
+    return {(before, after) for before, afters in rules.items() for after in afters}
+
+
+def is_ordered_indexed(
+    update: List[int], pairs: PairIndex, rules: Dict[int, set]
+) -> bool:
+    """``is_ordered`` that rejects most invalid updates from adjacent pairs.
+
+    A rule against any adjacent pair breaks the order, which one set probe
+    per pair finds. Adjacent pairs can never prove an update ordered,
+    though: with cyclic rules every adjacent pair can agree with a rule
+    while another rule points backwards across the update. Anything they
+    do not reject is confirmed with ``is_ordered``, so the result always
+    equals it.
+    """
+    successors = islice(update, 1, None)
+    if not pairs.isdisjoint(zip(successors, update)):
+        return False
+    return is_ordered(update, rules)
+
+
+def page_sort_key(pairs: PairIndex) -> Callable[[int], object]:
+    """Sort key that puts page a before page b when the rule a|b exists."""
+
+    def compare(a: int, b: int) -> int:
+        if (a, b) in pairs:
+            return -1
+        if (b, a) in pairs:
+            return 1
+        return 0
+
+    return cmp_to_key(compare)
+
+
+def reorder_update_indexed(
+    update: List[int],
+    pairs: PairIndex,
+    key: Callable[[int], object],
+    reorderer: PageReorderer,
+) -> List[int]:
+    # A comparison sort is only trustworthy when the rules relate every
+    # adjacent pair of its result and no rule points backwards across any
+    # pair, which also proves them acyclic; is_ordered checks the latter in
+    # O(V + E). Otherwise fall back to the graph sort, which reports cycles
+    reordered = sorted(update, key=key)
+    if pairs.issuperset(zip(reordered, islice(reordered, 1, None))):
+        if is_ordered(reordered, reorderer.rules):
+            return reordered
+    return reorderer.reorder(update)
+
+
+def pack_updates(updates: List[List[int]], pad: int) -> UpdateBatch:
+    lengths = array("q", map(len, updates))
+    stride = max(lengths, default=0) + 1
+    paddings = map(repeat, repeat(pad), map(sub, repeat(stride), lengths))
+    pages = array("q", chain.from_iterable(map(chain, updates, paddings)))
+    return UpdateBatch(pages, lengths, stride, pad)
+
+
+def rule_matrix(pairs: PairIndex, size: int, pad: int) -> bytearray:
+    """Row-major ``size`` x ``size`` matrix of rule codes.
+
+    Entry ``a * size + b`` is _BEFORE if a|b, _AFTER if b|a, _CONFLICT if
+    both and _UNRELATED otherwise. Pairs with the padding page count as
+    _BEFORE so the padding never makes a row invalid.
+    """
+    matrix = bytearray(size * size)
+    for before, after in pairs:
+        matrix[before * size + after] |= _BEFORE
+        matrix[after * size + before] |= _AFTER
+    matrix[pad * size : (pad + 1) * size] = bytes([_BEFORE]) * size
+    matrix[pad::size] = bytes([_BEFORE]) * size
+    return matrix
+
+
+def _row_sums(values: Sequence[int], lengths: Sequence[int]) -> List[int]:
+    # Sum of each run of lengths[i] consecutive values
+    stops = list(accumulate(lengths))
+    rows = map(values.__getitem__, map(slice, chain((0,), stops), stops))
+    return list(map(sum, rows))
+
+
+def bulk_middle_sums(
+    pairs: PairIndex, updates: List[List[int]]
+) -> Tuple[bytes, int, int]:
+    """Validate every update at once against a rule matrix.
+
+    Returns one byte per update (1 if it is correctly ordered) and the
+    middle-page sums of parts 1 and 2, using array lookups mapped over the
+    whole batch instead of a loop per update. As in ``is_ordered``, an
+    update is valid when no rule points backwards across any pair of its
+    pages. The few invalid updates whose rules do not totally order their
+    pages are reordered one at a time with PageReorderer, which raises
+    OrderingCycleError on cyclic rules.
+    """
+    pages_seen = chain(chain.from_iterable(pairs), chain.from_iterable(updates))
+    pad = max(pages_seen, default=0) + 1
+    size = pad + 1
+    matrix = rule_matrix(pairs, size, pad)
+    batch = pack_updates(updates, pad)
+    pages, lengths, stride = batch.pages, batch.lengths, batch.stride
+    starts = range(0, len(pages), stride)
+
+    # Bitsets of every page's successors under any rule and under rules
+    # without a conflicting one; the padding page has neither
+    rule_bits = [0] * size
+    after_bits = [0] * size
+    for page in range(pad):
+        row = matrix[page * size : page * size + pad][::-1]
+        rule_bits[page] = int(row.translate(_RULE_DIGITS), 2)
+        after_bits[page] = int(row.translate(_BEFORE_DIGITS), 2)
+    page_bits = list(map(lshift, repeat(1), range(pad)))
+    page_bits.append(0)
+
+    # Sweep the columns left to right with a bitset per update of the pages
+    # seen so far. A page with a successor among them breaks the order, as
+    # in is_ordered, and after the sweep the bitsets hold every update's pages
+    update_bits = [0] * len(lengths)
+    backwards = [0] * len(lengths)
+    for column in range(stride):
+        column_pages = pages[column::stride]
+        successors = map(rule_bits.__getitem__, column_pages)
+        seen_successors = map(and_, successors, update_bits)
+        backwards = list(map(or_, backwards, seen_successors))
+        column_bits = map(page_bits.__getitem__, column_pages)
+        update_bits = list(map(or_, update_bits, column_bits))
+    valid = bytes(map(not_, backwards))
+
+    halves = array("q", map(floordiv, lengths, repeat(2)))
+    middles = map(pages.__getitem__, map(add, starts, halves))
+    part1 = sum(map(mul, middles, valid))
+
+    # Count each page's successors within its update, as the popcount of its
+    # successor bitset ANDed with the update's bitset. If the counts are
+    # exactly 0 .. len - 1, which is when the bits 1 << count of an update
+    # sum to 2 ** len - 1, the rules totally order the update and its middle
+    # page is the one with (len - 1) // 2 pages after it
+    invalid = list(compress(updates, map(not_, valid)))
+    invalid_lengths = list(map(len, invalid))
+    invalid_pages = list(chain.from_iterable(invalid))
+    invalid_bits = compress(update_bits, map(not_, valid))
+    row_bits = chain.from_iterable(map(repeat, invalid_bits, invalid_lengths))
+    pages_after = map(and_, map(after_bits.__getitem__, invalid_pages), row_bits)
+    after_counts = list(map(_COUNT_ONES, map(bin, pages_after)))
+
+    count_bits = list(map(lshift, repeat(1), after_counts))
+    all_counts = map(sub, map(lshift, repeat(1), invalid_lengths), repeat(1))
+    totally_ordered = list(map(eq, _row_sums(count_bits, invalid_lengths), all_counts))
+
+    middle_after = map(floordiv, map(sub, invalid_lengths, repeat(1)), repeat(2))
+    row_middle_after = chain.from_iterable(map(repeat, middle_after, invalid_lengths))
+    is_middle = map(eq, after_counts, row_middle_after)
+    middle_pages = list(map(mul, invalid_pages, is_middle))
+    part2 = sum(compress(_row_sums(middle_pages, invalid_lengths), totally_ordered))
+
+    unordered = list(compress(invalid, map(not_, totally_ordered)))
+    if unordered:
+        rules: Dict[int, set] = defaultdict(set)
+        for before, after in pairs:
+            rules[before].add(after)
+        reorderer = PageReorderer(rules)
+        reordered = map(reorderer.reorder, unordered)
+        part2 += sum(map(find_middle_page, reordered))
+
+    return valid, part1, part2
+
+
+class IncrementalOrdering:
+    """Both middle-page sums, kept current while rules are added and removed.
+
+    An inverted index maps every page to the updates that contain it. A rule
+    a|b can only change updates holding both pages, so an edit re-checks
+    just those and adjusts the running sums by their change. Updates whose
+    rules form a cycle count towards neither sum and are listed in
+    ``cyclic_updates``.
+    """
+
+    def __init__(self, rules: List[str], updates: List[List[int]]) -> None:
+        self.rules = build_rules(rules)
+        self.updates = updates
+        self.page_updates: Dict[int, Set[int]] = defaultdict(set)
+        for update_id, update in enumerate(updates):
+            for page in update:
+                self.page_updates[page].add(update_id)
+
+        self._reorderer = PageReorderer(self.rules)
+        self.valid = bytearray(len(updates))
+        self.cyclic_updates: Set[int] = set()
+        self._middles = array("q", bytes(8 * len(updates)))
+        self.ordered_sum = 0
+        self.reordered_sum = 0
+        for update_id in range(len(updates)):
+            self._recheck(update_id)
+
+    def _recheck(self, update_id: int) -> None:
+        # Take the update's old contribution out of its sum, then re-add it
+        if self.valid[update_id]:
+            self.ordered_sum -= self._middles[update_id]
+        else:
+            self.reordered_sum -= self._middles[update_id]
+
+        update = self.updates[update_id]
+        self.cyclic_updates.discard(update_id)
+        if is_ordered(update, self.rules):
+            self.valid[update_id] = 1
+            middle = find_middle_page(update)
+            self.ordered_sum += middle
+        else:
+            self.valid[update_id] = 0
+            try:
+                middle = find_middle_page(self._reorderer.reorder(update))
+            except OrderingCycleError:
+                self.cyclic_updates.add(update_id)
+                middle = 0
+            self.reordered_sum += middle
+        self._middles[update_id] = middle
+
+    def _affected(self, before: int, after: int) -> Set[int]:
+        holding_before = self.page_updates.get(before, set())
+        return holding_before & self.page_updates.get(after, set())
+
+    def add_rule(self, before: int, after: int) -> None:
+        if after in self.rules.get(before, ()):
+            return
+        self.rules[before].add(after)
+        for update_id in self._affected(before, after):
+            self._recheck(update_id)
+
+    def remove_rule(self, before: int, after: int) -> None:
+        if after not in self.rules.get(before, ()):
+            return
+        self.rules[before].discard(after)
+        for update_id in self._affected(before, after):
+            self._recheck(update_id)
+
+
+def _reorder_update_recursive(update: List[int], rules: Dict[int, set]) -> List[int]:
+    # Recursive DFS over the reversed rules; it silently skips cycles and
+    # hits the recursion limit on long updates
     graph = {num: set() for num in update}
     for num in update:
         if num in rules:
@@ -50,15 +466,12 @@ def reorder_update(update: List[int], rules: Dict[int, set]) -> List[int]:
                 if must_come_after in graph:
                     graph[must_come_after].add(num)
 
-    # Topological sort
     result = []
     visited = set()
     temp_visited = set()
 
     def visit(num):
-        if num in temp_visited:
-            return  # Handle cycles by skipping
-        if num in visited:
+        if num in temp_visited or num in visited:
             return
         temp_visited.add(num)
         for before in graph[num]:
@@ -71,19 +484,121 @@ def reorder_update(update: List[int], rules: Dict[int, set]) -> List[int]:
         if num not in visited:
             visit(num)
 
-    return result[::-1]  # Reverse to get correct order
+    return result
+
+
+def _random_workload(
+    page_count: int, update_count: int
+) -> Tuple[List[str], List[List[int]]]:
+    import random
+
+    # Every pair of pages gets a rule that agrees with one hidden order
+    order = random.sample(range(10, 10 + page_count), page_count)
+    rules = [f"{a}|{b}" for a, b in combinations(order, 2)]
+    updates = []
+    for _ in range(update_count):
+        update = random.sample(order, random.randrange(5, 25, 2))
+        if random.random() < 0.5:
+            update.sort(key=order.index)
+        updates.append(update)
+    return rules, updates
+
+
+def run_benchmark(page_count: int, update_count: int) -> None:
+    import time
+
+    rules, updates = _random_workload(page_count, update_count)
+    rule_dict = build_rules(rules)
+
+    start_time = time.perf_counter()
+    valid = [is_ordered(update, rule_dict) for update in updates]
+    reordered = [
+        _reorder_update_recursive(update, rule_dict)
+        for update, ordered in zip(updates, valid)
+        if not ordered
+    ]
+    baseline_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    pairs = build_pair_index(rule_dict)
+    key = page_sort_key(pairs)
+    reorderer = PageReorderer(rule_dict)
+    assert [is_ordered_indexed(update, pairs, rule_dict) for update in updates] == valid
+    assert [
+        reorder_update_indexed(update, pairs, key, reorderer)
+        for update, ordered in zip(updates, valid)
+        if not ordered
+    ] == reordered
+    indexed_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    assert [
+        reorderer.reorder(update)
+        for update, ordered in zip(updates, valid)
+        if not ordered
+    ] == reordered
+    kahn_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    assert bulk_middle_sums(pairs, updates)[0] == bytes(valid)
+    bulk_time = time.perf_counter() - start_time
+
+    print(
+        f"{len(rules)} rules, {update_count} updates: per-update graphs "
+        f"{baseline_time:.3f}s, pair index {indexed_time:.3f}s "
+        f"({baseline_time / indexed_time:.1f}x), bulk matrix {bulk_time:.3f}s "
+        f"({baseline_time / bulk_time:.1f}x); reordering alone: Kahn {kahn_time:.3f}s"
+    )
+
+
+def run_edit_benchmark(page_count: int, update_count: int, edit_count: int) -> None:
+    import random
+    import time
+
+    rules, updates = _random_workload(page_count, update_count)
+    pages = sorted(set(chain.from_iterable(updates)))
+    edits = [
+        (random.random() < 0.5, *random.sample(pages, 2)) for _ in range(edit_count)
+    ]
+    engine = IncrementalOrdering(rules, updates)
+
+    start_time = time.perf_counter()
+    for add_edit, before, after in edits:
+        if add_edit:
+            engine.add_rule(before, after)
+        else:
+            engine.remove_rule(before, after)
+    incremental_time = time.perf_counter() - start_time
+
+    # Rebuilding from scratch once per edit is what main would have to do
+    start_time = time.perf_counter()
+    full = IncrementalOrdering(
+        [f"{a}|{b}" for a, afters in engine.rules.items() for b in afters], updates
+    )
+    full_time = (time.perf_counter() - start_time) * edit_count
+    assert (full.ordered_sum, full.reordered_sum) == (
+        engine.ordered_sum,
+        engine.reordered_sum,
+    )
+    print(
+        f"{edit_count} edits on {update_count} updates: incremental "
+        f"{incremental_time:.3f}s, full re-check per edit ~{full_time:.3f}s "
+        f"({full_time / incremental_time:.0f}x)"
+    )
 
 
 def main(file_path: str) -> Tuple[int, int]:
     rules, updates = read_input(file_path)
     rule_dict = build_rules(rules)
+    pairs = build_pair_index(rule_dict)
+    reorderer = PageReorderer(rule_dict)
 
     # Part 1
     total_middle_sum = 0
     invalid_updates = []
 
     for update in updates:
-        if is_ordered(update, rule_dict):
+        if is_ordered_indexed(update, pairs, rule_dict):
             middle = find_middle_page(update)
             print(f"Part 1 - Valid update: {update}, middle: {middle}")
             total_middle_sum += middle
@@ -94,7 +609,8 @@ def main(file_path: str) -> Tuple[int, int]:
     # Part 2
     reordered_sum = 0
     for update in invalid_updates:
-        reordered = reorder_update(update, rule_dict)
+        # Kahn's algorithm is O(V + E) per update and reports cycles
+        reordered = reorderer.reorder(update)
         middle = find_middle_page(reordered)
         print(f"Part 2 - Reordered {update} to {reordered}, middle: {middle}")
         reordered_sum += middle
@@ -103,10 +619,51 @@ def main(file_path: str) -> Tuple[int, int]:
 
 
 if __name__ == "__main__":
-    part1_result, part2_result = main("input/day5.txt")
-    print(
-        f"\nPart 1 - Sum of middle pages from correctly ordered updates: {part1_result}"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Day 5: Print Queue")
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="UPDATES",
+        help="Benchmark the pair index on UPDATES random updates",
     )
-    print(
-        f"Part 2 - Sum of middle pages from reordered invalid updates: {part2_result}"
+    parser.add_argument(
+        "--pages", type=int, default=90, help="Distinct page count for --benchmark"
+    )
+    parser.add_argument(
+        "--benchmark-edits",
+        type=int,
+        metavar="EDITS",
+        help="Time EDITS random rule edits with the incremental engine",
     )
+    parser.add_argument(
+        "--updates", type=int, default=10000, help="Update count for --benchmark-edits"
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Validate all updates at once against a rule matrix",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.pages, args.benchmark)
+    elif args.benchmark_edits:
+        run_edit_benchmark(args.pages, args.updates, args.benchmark_edits)
+    elif args.bulk:
+        rules, updates = read_input("input/day5.txt")
+        pairs = build_pair_index(build_rules(rules))
+        _, part1_result, part2_result = bulk_middle_sums(pairs, updates)
+        print(f"Part 1 - Sum of middle pages: {part1_result}")
+        print(f"Part 2 - Sum of reordered middle pages: {part2_result}")
+    else:
+        part1_result, part2_result = main("input/day5.txt")
+        print(
+            "\nPart 1 - Sum of middle pages from correctly ordered updates: "
+            f"{part1_result}"
+        )
+        print(
+            "Part 2 - Sum of middle pages from reordered invalid updates: "
+            f"{part2_result}"
+        )
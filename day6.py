@@ -1,5 +1,11 @@
+from array import array
+from bisect import bisect_left
 from enum import Enum
-from typing import List, Set, Tuple
+from itertools import repeat
+from operator import rshift
+from typing import List, Optional, Sequence, Set, Tuple
+
+from grid import Grid
 
 
 class Direction(Enum):
@@ -17,22 +23,147 @@ class Direction(Enum):
         }[self]
 
 
+# Directions in turning order; a heading is an index into this tuple
+HEADINGS = (Direction.UP, Direction.RIGHT, Direction.DOWN, Direction.LEFT)
+HEADING_SYMBOLS = "^>v<"
+_GUARD_TO_VISITED = str.maketrans(HEADING_SYMBOLS, "XXXX")
+
+
+class TraceRecorder:
+    """Compact step-by-step trace of the guard.
+
+    Every step is one unsigned int, ``(y * width + x) * 4 + heading``. By
+    default only the last ``capacity`` steps are kept in a ring buffer; with
+    ``file_path`` every step is kept and written to that file in blocks of
+    ``capacity`` records, after a header of the grid size. Use
+    ``read_trace`` and the ``render_*`` functions to look at a trace.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        file_path: Optional[str] = None,
+        capacity: int = 1 << 16,
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.steps = 0
+        typecode = "I" if width * height * 4 <= 0xFFFFFFFF else "Q"
+        self._buffer = array(typecode)
+        self._file = open(file_path, "wb") if file_path else None
+        if self._file:
+            array("q", [width, height]).tofile(self._file)
+
+    def record(self, x: int, y: int, heading: int) -> None:
+        value = (y * self.width + x) * 4 + heading
+        if len(self._buffer) < self.capacity:
+            self._buffer.append(value)
+        elif self._file:
+            self._buffer.tofile(self._file)
+            self._buffer = array(self._buffer.typecode, [value])
+        else:
+            self._buffer[self.steps % self.capacity] = value
+        self.steps += 1
+
+    def records(self) -> Tuple[int, array]:
+        """The first step still held and the records from there, in order."""
+        if self._file:
+            raise ValueError("A file trace is read back with read_trace()")
+        first_step = max(0, self.steps - self.capacity)
+        split = self.steps % self.capacity if first_step else 0
+        return first_step, self._buffer[split:] + self._buffer[:split]
+
+    def close(self) -> None:
+        if self._file:
+            self._buffer.tofile(self._file)
+            self._buffer = array(self._buffer.typecode)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "TraceRecorder":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def read_trace(file_path: str) -> Tuple[int, int, array]:
+    """Read a trace file back as ``(width, height, records)``."""
+    with open(file_path, "rb") as file:
+        header = array("q")
+        header.fromfile(file, 2)
+        width, height = header
+        records = array("I" if width * height * 4 <= 0xFFFFFFFF else "Q")
+        records.frombytes(file.read())
+    return width, height, records
+
+
+def render_frame(
+    grid: List[str], records: Sequence[int], frame: int, first_step: int = 0
+) -> str:
+    """The grid after step ``frame``, with the cells visited so far as X.
+
+    ``records`` start at step ``first_step``; a ring buffer trace only
+    shows the visits it still holds. Raises ValueError for a frame the
+    records do not cover.
+    """
+    if not first_step <= frame < first_step + len(records):
+        last_step = first_step + len(records) - 1
+        raise ValueError(f"Frame {frame} is outside steps {first_step}-{last_step}")
+    # Without padding, a Grid's flat indices are the trace positions
+    frame_grid = Grid.from_rows(grid, pad=0)
+    cells = frame_grid.cells
+    shown = records[: frame - first_step + 1]
+    for position in map(rshift, shown, repeat(2)):
+        cells[position] = ord("X")
+    if shown:
+        last = shown[-1]
+        cells[last >> 2] = ord(HEADING_SYMBOLS[last & 3])
+    return "\n".join(row.tobytes().decode() for row in frame_grid.rows())
+
+
+def render_visited(grid: List[str], records: Sequence[int]) -> str:
+    """The visited map of a whole trace, without the guard."""
+    final_frame = render_frame(grid, records, len(records) - 1)
+    return final_frame.translate(_GUARD_TO_VISITED)
+
+
+def replay_trace(grid: List[str], trace_path: str, frame: Optional[int] = None) -> str:
+    """Render step ``frame`` of a trace file, or its visited map by default."""
+    width, height, records = read_trace(trace_path)
+    if (width, height) != (len(grid[0]), len(grid)):
+        raise ValueError(
+            f"Trace is for a {width}x{height} grid, not {len(grid[0])}x{len(grid)}"
+        )
+    if frame is None:
+        return render_visited(grid, records)
+    return render_frame(grid, records, frame)
+
+
 def read_input(file_path: str) -> List[str]:
     with open(file_path, "r") as file:
         return [line.strip() for line in file]
 
 
+GUARD_SYMBOLS = {
+    "^": Direction.UP,
+    ">": Direction.RIGHT,
+    "v": Direction.DOWN,
+    "<": Direction.LEFT,
+}
+
+
 def find_start_position(grid: List[str]) -> Tuple[int, int, Direction]:
     for y, row in enumerate(grid):
-        for x, cell in enumerate(row):
-            if cell == "^":
-                return x, y, Direction.UP
-            elif cell == ">":
-                return x, y, Direction.RIGHT
-            elif cell == "v":
-                return x, y, Direction.DOWN
-            elif cell == "<":
-                return x, y, Direction.LEFT
+        # Let str.find scan each row; the leftmost guard symbol wins
+        found = [
+            (row.find(symbol), symbol) for symbol in GUARD_SYMBOLS if symbol in row
+        ]
+        if found:
+            x, symbol = min(found)
+            return x, y, GUARD_SYMBOLS[symbol]
     raise ValueError("No starting position found")
 
 
@@ -40,10 +171,13 @@ def is_within_grid(x: int, y: int, grid: List[str]) -> bool:
     return 0 <= y < len(grid) and 0 <= x < len(grid[0])
 
 
-def simulate_guard_path(grid: List[str], debug: bool = False) -> int:
+def simulate_guard_path(
+    grid: List[str], debug: bool = False, trace: Optional[TraceRecorder] = None
+) -> int:
     # Find starting position and direction
     x, y, direction = find_start_position(grid)
     visited = {(x, y)}  # Set of visited positions
+    heading = HEADINGS.index(direction)
 
     if debug:
         print("\nInitial state:")
@@ -51,6 +185,10 @@ def simulate_guard_path(grid: List[str], debug: bool = False) -> int:
 
     step = 0
     while True:
+        # Record the state the guard is in before this step
+        if trace:
+            trace.record(x, y, heading)
+
         # Calculate next position
         dx, dy = direction.value
         next_x = x + dx
@@ -66,6 +204,7 @@ def simulate_guard_path(grid: List[str], debug: bool = False) -> int:
         if grid[next_y][next_x] == "#":
             # Turn right
             direction = direction.turn_right()
+            heading = (heading + 1) % 4
             if debug:
                 print(
                     f"\nStep {step + 1}: Turned right at ({x}, {y}), now facing {direction.name}"
@@ -77,8 +216,6 @@ def simulate_guard_path(grid: List[str], debug: bool = False) -> int:
             if debug:
                 print(f"\nStep {step + 1}: Moved to ({x}, {y})")
 
-        if debug:
-            print_current_state(grid, visited, x, y, direction)
         step += 1
 
     if debug:
@@ -88,35 +225,110 @@ def simulate_guard_path(grid: List[str], debug: bool = False) -> int:
     return len(visited)
 
 
-def print_grid(grid: List[str]):
-    for row in grid:
-        print(row)
+def build_jump_tables(grid: Grid) -> Tuple[List[List[int]], List[List[int]]]:
+    """Sorted obstacle x positions per row and y positions per column."""
+    row_obstacles: List[List[int]] = [[] for _ in range(grid.height)]
+    column_obstacles: List[List[int]] = [[] for _ in range(grid.width)]
+    for index in grid.find_all(ord("#")):
+        x, y = grid.position(index)
+        row_obstacles[y].append(x)
+        column_obstacles[x].append(y)
+    return row_obstacles, column_obstacles
 
 
-def print_current_state(
-    grid: List[str],
-    visited: Set[Tuple[int, int]],
-    guard_x: int,
-    guard_y: int,
-    direction: Direction,
-):
-    direction_chars = {
-        Direction.UP: "^",
-        Direction.RIGHT: ">",
-        Direction.DOWN: "v",
-        Direction.LEFT: "<",
-    }
+def simulate_guard_path_jumping(grid: List[str]) -> int:
+    """``simulate_guard_path`` that jumps straight to the next obstacle.
 
-    for y, row in enumerate(grid):
-        line = ""
-        for x, cell in enumerate(row):
-            if (x, y) == (guard_x, guard_y):
-                line += direction_chars[direction]
-            elif (x, y) in visited:
-                line += "X"
-            else:
-                line += cell
-        print(line)
+    Each leg is one bisect in the row or column obstacle table plus one
+    slice assignment marking the cells it crosses, so the walk takes
+    O(turns) Python steps instead of O(path length). Raises ValueError if
+    the guard walks in a loop, where the step-by-step version never ends.
+    """
+    flat_grid = Grid.from_rows(grid)
+    height, width, stride = flat_grid.height, flat_grid.width, flat_grid.stride
+    row_obstacles, column_obstacles = build_jump_tables(flat_grid)
+    x, y, direction = find_start_position(grid)
+    heading = HEADINGS.index(direction)
+    cells = flat_grid.cells
+    turns = set()
+
+    while True:
+        vertical = heading % 2 == 0
+        obstacles = column_obstacles[x] if vertical else row_obstacles[y]
+        position, limit = (y, height) if vertical else (x, width)
+        i = bisect_left(obstacles, position)
+        if heading in (0, 3):  # up or left, towards smaller coordinates
+            leaving = i == 0
+            stop = 0 if leaving else obstacles[i - 1] + 1
+            first, last = stop, position
+        else:
+            leaving = i == len(obstacles)
+            stop = limit - 1 if leaving else obstacles[i] - 1
+            first, last = position, stop
+
+        # Mark every cell of the leg as visited with one slice assignment
+        if vertical:
+            leg = slice(flat_grid.index(x, first), flat_grid.index(x, last) + 1, stride)
+            y = stop
+        else:
+            leg = slice(flat_grid.index(first, y), flat_grid.index(last, y) + 1)
+            x = stop
+        cells[leg] = b"X" * (last - first + 1)
+
+        if leaving:
+            return cells.count(ord("X"))
+        state = (x, y, heading)
+        if state in turns:
+            raise ValueError("The guard walks in a loop and never leaves the grid")
+        turns.add(state)
+        heading = (heading + 1) % 4
+
+
+def spiral_map(size: int, spacing: int) -> List[str]:
+    """A sparse map whose guard spirals out from the centre and then leaves.
+
+    Legs grow by ``spacing`` cells every two turns, so the path covers about
+    size**2 / spacing cells with only about 2 * size / spacing obstacles.
+    """
+    cells = [["."] * size for _ in range(size)]
+    x = y = size // 2
+    cells[y][x] = "^"
+    deltas = [direction.value for direction in HEADINGS]
+    heading = 0
+    leg = spacing
+    while True:
+        dx, dy = deltas[heading]
+        x, y = x + dx * leg, y + dy * leg
+        if not (0 <= x + dx < size and 0 <= y + dy < size):
+            break
+        cells[y + dy][x + dx] = "#"
+        heading = (heading + 1) % 4
+        if heading % 2 == 0:
+            leg += spacing
+    return ["".join(row) for row in cells]
+
+
+def run_benchmark(size: int, spacing: int) -> None:
+    import time
+
+    grid = spiral_map(size, spacing)
+    start_time = time.perf_counter()
+    visited_count = simulate_guard_path_jumping(grid)
+    jump_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    assert simulate_guard_path(grid) == visited_count
+    step_time = time.perf_counter() - start_time
+    print(
+        f"{size}x{size} spiral, spacing {spacing}: {visited_count} cells visited, "
+        f"step by step {step_time:.3f}s, jump table {jump_time:.4f}s "
+        f"({step_time / jump_time:.0f}x)"
+    )
+
+
+def print_grid(grid: List[str]):
+    for row in grid:
+        print(row)
 
 
 def print_visited_positions(grid: List[str], visited: Set[Tuple[int, int]]):
@@ -132,9 +344,18 @@ def print_visited_positions(grid: List[str], visited: Set[Tuple[int, int]]):
         print(line)
 
 
-def main(file_path: str, debug: bool = False) -> int:
+def main(file_path: str, debug: bool = False, trace_path: Optional[str] = None) -> int:
     grid = read_input(file_path)
-    distinct_positions = simulate_guard_path(grid, debug)
+    if debug or trace_path:
+        # Debug runs keep the last steps in memory; --trace keeps them all
+        with TraceRecorder(len(grid[0]), len(grid), trace_path) as trace:
+            distinct_positions = simulate_guard_path(grid, debug, trace)
+        if debug and not trace_path:
+            first_step, records = trace.records()
+            print(f"\nFinal state (trace holds steps {first_step}-{trace.steps - 1}):")
+            print(render_frame(grid, records, trace.steps - 1, first_step))
+    else:
+        distinct_positions = simulate_guard_path_jumping(grid)
     if debug:
         print(f"\nTotal distinct positions visited: {distinct_positions}")
     return distinct_positions
@@ -145,7 +366,30 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Day 6: Guard Gallivant")
     parser.add_argument("--debug", action="store_true", help="Enable debug output")
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="SIZE",
+        help="Benchmark the jump table on a SIZE x SIZE spiral map",
+    )
+    parser.add_argument(
+        "--spacing", type=int, default=4, help="Spiral ring spacing for --benchmark"
+    )
+    parser.add_argument("--trace", help="Record every step of the guard to this file")
+    parser.add_argument(
+        "--replay", help="Render a trace file recorded with --trace and exit"
+    )
+    parser.add_argument(
+        "--frame",
+        type=int,
+        help="Step to render with --replay (default: the final visited map)",
+    )
     args = parser.parse_args()
 
-    result = main("input/day06.txt", args.debug)
-    print(f"Final answer: {result}")  # Should be 41 for the example
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.spacing)
+    elif args.replay:
+        print(replay_trace(read_input("input/day06.txt"), args.replay, args.frame))
+    else:
+        result = main("input/day06.txt", args.debug, args.trace)
+        print(f"Final answer: {result}")  # Should be 41 for the example
@@ -1,7 +1,12 @@
 import time
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from enum import Enum
-from typing import List, Set, Tuple
+from functools import partial
+from typing import List, Optional, Set, Tuple
+
+from grid import Grid
 
 
 class Direction(Enum):
@@ -38,6 +43,318 @@ def find_start_position(grid: List[List[str]]) -> Tuple[int, int, Direction]:
     raise ValueError("No starting position found")
 
 
+def path_candidates(
+    grid: List[List[str]], start_x: int, start_y: int, start_direction: Direction
+) -> List[Tuple[Tuple[int, int], Tuple[int, int, Direction]]]:
+    """Cells of the guard's original route in first-visit order.
+
+    Each cell comes with the guard's state just before it first steps
+    there. An obstruction anywhere else is never reached, so only these
+    cells can change the route, and up to that state the route is the same
+    as without the obstruction.
+    """
+    x, y, direction = start_x, start_y, start_direction
+    rows, cols = len(grid), len(grid[0])
+    seen = {(x, y)}
+    candidates = []
+
+    for _ in range(rows * cols * 4):
+        dx, dy = direction.value
+        next_x, next_y = x + dx, y + dy
+        if not (0 <= next_y < rows and 0 <= next_x < cols):
+            return candidates
+        if grid[next_y][next_x] == "#":
+            direction = direction.turn_right()
+            continue
+        if (next_x, next_y) not in seen:
+            seen.add((next_x, next_y))
+            candidates.append(((next_x, next_y), (x, y, direction)))
+        x, y = next_x, next_y
+
+    raise ValueError("The guard walks in a loop even without an obstruction")
+
+
+# Directions in turning order; a heading is an index into this tuple
+HEADINGS = (Direction.UP, Direction.RIGHT, Direction.DOWN, Direction.LEFT)
+_OBSTACLE = ord("#")
+
+
+class LoopDetector:
+    """Loop checks for single obstructions on a padded flat grid.
+
+    A guard state is one int, ``flat_index * 4 + heading``, and the walk
+    stops on the grid's border cells instead of checking bounds. By default
+    the states at turns are marked in one bytearray that is reused across
+    checks and cleared only where it was written; a loop always repeats a
+    turn. With ``brent=True`` Brent's cycle detection over the sequence of
+    turn states is used instead, in O(1) memory.
+    """
+
+    def __init__(self, grid: List[List[str]], brent: bool = False) -> None:
+        self.grid = Grid.from_rows(grid)
+        self.brent = brent
+        self._seen = bytearray(4 * len(self.grid.cells))
+
+    def state(self, x: int, y: int, direction: Direction) -> int:
+        return self.grid.index(x, y) * 4 + HEADINGS.index(direction)
+
+    def causes_loop(self, obstruction: Tuple[int, int], state: int) -> bool:
+        """Whether the guard, from ``state``, loops with ``obstruction`` added."""
+        cells = self.grid.cells
+        position = self.grid.index(*obstruction)
+        original = cells[position]
+        cells[position] = _OBSTACLE
+        try:
+            if self.brent:
+                return self._loops_brent(state)
+            return self._loops_marked(state)
+        finally:
+            cells[position] = original
+
+    def _next_turn(self, state: int) -> int:
+        # Walk from `state` to the next turn; -1 once the guard leaves
+        cells = self.grid.cells
+        offsets = self.grid.offsets
+        border = self.grid.border
+        position, heading = state >> 2, state & 3
+        step = offsets[heading]
+        while True:
+            cell = cells[position + step]
+            if cell == _OBSTACLE:
+                return position << 2 | (heading + 1) & 3
+            if cell == border:
+                return -1
+            position += step
+
+    def _loops_marked(self, state: int) -> bool:
+        seen = self._seen
+        marked = []
+        try:
+            state = self._next_turn(state)
+            while state != -1:
+                if seen[state]:
+                    return True
+                seen[state] = 1
+                marked.append(state)
+                state = self._next_turn(state)
+            return False
+        finally:
+            for state in marked:
+                seen[state] = 0
+
+    def _loops_brent(self, state: int) -> bool:
+        power = length = 1
+        tortoise = state
+        hare = self._next_turn(state)
+        while hare != tortoise:
+            if hare == -1:
+                return False
+            if power == length:
+                tortoise = hare
+                power *= 2
+                length = 0
+            hare = self._next_turn(hare)
+            length += 1
+        return True
+
+
+class TurnGraph:
+    """Guard route as a successor table over turn states, for loop queries.
+
+    For every cell and heading, ``_ends[heading][cell]`` is the flat index
+    of the obstacle or border cell the guard runs into from there, so the
+    successor of a state (the next turn, or the exit) is one lookup. A
+    temporary obstruction only patches the edges whose leg it cuts: a leg
+    ends early exactly when the obstruction lies on it, which is an O(1)
+    check, and the obstruction's own approach cells become new turn states.
+    Queries walk turn to turn and never touch the grid.
+    """
+
+    def __init__(self, grid: List[List[str]]) -> None:
+        self.grid = Grid.from_rows(grid)
+        start_x, start_y, direction = find_start_position(grid)
+        self._start_position = self.grid.index(start_x, start_y)
+        self.start = self._start_position * 4 + HEADINGS.index(direction)
+        self._seen = bytearray(4 * len(self.grid.cells))
+        self._ends = [self._leg_ends(step) for step in self.grid.offsets]
+
+    def _leg_ends(self, step: int) -> array:
+        # One sweep against the walking direction: a cell's leg ends where
+        # its next cell's leg ends, unless that next cell already blocks it
+        cells = self.grid.cells
+        border = self.grid.border
+        ends = array("i", bytes(4 * len(cells)))
+        order = range(len(cells)) if step < 0 else range(len(cells) - 1, -1, -1)
+        for cell in order:
+            ahead = cell + step
+            if not 0 <= ahead < len(cells):
+                continue
+            if cells[ahead] == _OBSTACLE or cells[ahead] == border:
+                ends[cell] = ahead
+            else:
+                ends[cell] = ends[ahead]
+        return ends
+
+    def successor(self, state: int, obstruction: int = -1) -> int:
+        """Next turn state after ``state``, or -1 once the guard leaves.
+
+        ``obstruction`` is the flat index of an extra obstacle, if any.
+        """
+        position, heading = state >> 2, state & 3
+        step = self.grid.offsets[heading]
+        end = self._ends[heading][position]
+        if obstruction >= 0:
+            # The obstruction cuts the leg if it lies on the cells walked
+            # before `end`; those are all on one row or column
+            distance, off_line = divmod(obstruction - position, step)
+            if not off_line and 0 < distance < (end - position) // step:
+                end = obstruction
+        if self.grid.cells[end] == self.grid.border:
+            return -1
+        return (end - step) << 2 | (heading + 1) & 3
+
+    def causes_loop(self, x: int, y: int) -> bool:
+        """Whether an obstruction at ``(x, y)`` traps the guard in a loop."""
+        grid = self.grid
+        if not (0 <= x < grid.width and 0 <= y < grid.height):
+            return False
+        obstruction = grid.index(x, y)
+        if obstruction == self._start_position or grid.cells[obstruction] == _OBSTACLE:
+            return False
+
+        seen = self._seen
+        marked = []
+        try:
+            state = self.successor(self.start, obstruction)
+            while state != -1:
+                if seen[state]:
+                    return True
+                seen[state] = 1
+                marked.append(state)
+                state = self.successor(state, obstruction)
+            return False
+        finally:
+            for state in marked:
+                seen[state] = 0
+
+
+def _print_progress(done: int, total: int, valid_count: int, start_time: float) -> None:
+    elapsed = time.time() - start_time
+    progress = done / total
+    eta = (elapsed / progress) * (1 - progress) if progress > 0 else 0
+    print(
+        f"Progress: {done}/{total} ({progress:.1%}), "
+        f"Valid found: {valid_count}, ETA: {eta:.1f}s"
+    )
+
+
+def find_loop_positions(
+    grid: List[List[str]], debug: bool = False, brent: bool = False
+) -> int:
+    start_x, start_y, start_direction = find_start_position(grid)
+    candidates = path_candidates(grid, start_x, start_y, start_direction)
+    detector = LoopDetector(grid, brent)
+    valid_count = 0
+    total_positions = len(candidates)
+
+    if debug:
+        print(f"Grid size: {len(grid)}x{len(grid[0])}")
+        print(f"Testing {total_positions} positions on the guard's path...")
+        start_time = time.time()
+        last_update = start_time
+
+    # Try each cell of the path, resuming from the state just before it
+    for i, (pos, (x, y, direction)) in enumerate(candidates, 1):
+        if detector.causes_loop(pos, detector.state(x, y, direction)):
+            valid_count += 1
+
+        # Print progress every second in debug mode
+        if debug and time.time() - last_update >= 1.0:
+            _print_progress(i, total_positions, valid_count, start_time)
+            last_update = time.time()
+
+    if debug:
+        print(
+            f"\nFound {valid_count} valid positions in "
+            f"{time.time() - start_time:.1f} seconds"
+        )
+
+    return valid_count
+
+
+# Detector of a pool worker, built once per process by _init_worker
+_worker_detector: Optional[LoopDetector] = None
+
+
+def _init_worker(grid: List[List[str]], brent: bool) -> None:
+    global _worker_detector
+    _worker_detector = LoopDetector(grid, brent)
+
+
+def _count_loops(chunk: List[Tuple[Tuple[int, int], int]]) -> int:
+    return sum(_worker_detector.causes_loop(pos, state) for pos, state in chunk)
+
+
+def find_loop_positions_parallel(
+    grid: List[List[str]],
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    debug: bool = False,
+    brent: bool = False,
+) -> int:
+    """``find_loop_positions`` with the candidates split over a process pool.
+
+    The grid reaches each worker once, through the pool initializer; tasks
+    only carry chunks of (obstruction, state) pairs.
+    """
+    start_x, start_y, start_direction = find_start_position(grid)
+    detector = LoopDetector(grid, brent)
+    candidates = [
+        (pos, detector.state(x, y, direction))
+        for pos, (x, y, direction) in path_candidates(
+            grid, start_x, start_y, start_direction
+        )
+    ]
+    total_positions = len(candidates)
+    valid_count = 0
+    done = 0
+
+    if debug:
+        print(f"Grid size: {len(grid)}x{len(grid[0])}")
+        print(f"Testing {total_positions} positions with {workers or 'all'} workers")
+        start_time = time.time()
+        last_update = start_time
+
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(grid, brent)
+    ) as executor:
+        chunk_sizes = {}
+        for start in range(0, total_positions, chunk_size):
+            chunk = candidates[start : start + chunk_size]
+            chunk_sizes[executor.submit(_count_loops, chunk)] = len(chunk)
+
+        for future in as_completed(chunk_sizes):
+            valid_count += future.result()
+            done += chunk_sizes[future]
+
+            # Print progress every second in debug mode
+            if debug and time.time() - last_update >= 1.0:
+                _print_progress(done, total_positions, valid_count, start_time)
+                last_update = time.time()
+
+    if debug:
+        print(
+            f"\nFound {valid_count} valid positions in "
+            f"{time.time() - start_time:.1f} seconds"
+        )
+
+    return valid_count
+
+
+# The original obstruction search, which walks the guard with a dict of
+# (x, y, Direction) states; run_benchmark times LoopDetector against it
+
+
 def find_empty_positions(
     grid: List[List[str]], start_x: int, start_y: int
 ) -> Set[Tuple[int, int]]:
@@ -101,49 +418,137 @@ def simulate_guard_path_with_loop_detection(
     return False
 
 
-def find_loop_positions(grid: List[List[str]], debug: bool = False) -> int:
+def _find_loop_positions_dict_states(grid: List[List[str]]) -> int:
+    # Path-only search, walking each candidate with the state dict
     start_x, start_y, start_direction = find_start_position(grid)
-    empty_positions = find_empty_positions(grid, start_x, start_y)
-    valid_count = 0
-
-    # Calculate maximum possible steps based on grid size
     max_steps = len(grid) * len(grid[0]) * 4
-    total_positions = len(empty_positions)
+    return sum(
+        simulate_guard_path_with_loop_detection(grid, x, y, direction, pos, max_steps)
+        for pos, (x, y, direction) in path_candidates(
+            grid, start_x, start_y, start_direction
+        )
+    )
 
-    if debug:
-        print(f"Grid size: {len(grid)}x{len(grid[0])}")
-        print(f"Testing {total_positions} possible positions...")
-        start_time = time.time()
-        last_update = start_time
 
-    # Try placing an obstruction at each empty position
-    for i, pos in enumerate(empty_positions, 1):
-        if simulate_guard_path_with_loop_detection(
+def _find_loop_positions_all_cells(grid: List[List[str]]) -> int:
+    # Every empty cell, each walked from the start
+    start_x, start_y, start_direction = find_start_position(grid)
+    empty_positions = find_empty_positions(grid, start_x, start_y)
+    max_steps = len(grid) * len(grid[0]) * 4
+    return sum(
+        simulate_guard_path_with_loop_detection(
             grid, start_x, start_y, start_direction, pos, max_steps
+        )
+        for pos in empty_positions
+    )
+
+
+def random_map(size: int, density: float) -> List[List[str]]:
+    import random
+
+    # Draw maps until the guard walks off without an obstruction
+    while True:
+        grid = [
+            ["#" if random.random() < density else "." for _ in range(size)]
+            for _ in range(size)
+        ]
+        grid[size // 2][size // 2] = "^"
+        try:
+            path_candidates(grid, size // 2, size // 2, Direction.UP)
+        except ValueError:
+            continue
+        return grid
+
+
+def run_benchmark(sizes: List[int], density: float, baseline_max: int) -> None:
+    for size in sizes:
+        grid = random_map(size, density)
+        counts = []
+        timings = []
+        for search in (
+            find_loop_positions,
+            partial(find_loop_positions, brent=True),
+            _find_loop_positions_dict_states,
         ):
-            valid_count += 1
-
-        # Print progress every second in debug mode
-        if debug and time.time() - last_update >= 1.0:
-            elapsed = time.time() - start_time
-            progress = i / total_positions
-            eta = (elapsed / progress) * (1 - progress) if progress > 0 else 0
-            print(
-                f"Progress: {i}/{total_positions} ({progress:.1%}), Valid found: {valid_count}, ETA: {eta:.1f}s"
-            )
-            last_update = time.time()
-
-    if debug:
+            start_time = time.perf_counter()
+            counts.append(search(grid))
+            timings.append(time.perf_counter() - start_time)
+        count = counts[0]
+        assert counts == [count] * len(counts)
+
+        if size <= baseline_max:
+            start_time = time.perf_counter()
+            assert _find_loop_positions_all_cells(grid) == count
+            baseline = f"every empty cell {time.perf_counter() - start_time:.3f}s"
+        else:
+            baseline = "every empty cell skipped"
         print(
-            f"\nFound {valid_count} valid positions in {time.time() - start_time:.1f} seconds"
+            f"{size}x{size}: {count} loop positions, {baseline}, path only with "
+            f"state dict {timings[2]:.3f}s, int states {timings[0]:.3f}s, "
+            f"Brent {timings[1]:.3f}s"
         )
 
-    return valid_count
+
+def run_parallel_benchmark(
+    size: int, density: float, worker_counts: List[int], chunk_size: int
+) -> None:
+    grid = random_map(size, density)
+    start_time = time.perf_counter()
+    expected = find_loop_positions(grid)
+    serial_time = time.perf_counter() - start_time
+    print(f"{size}x{size}: {expected} loop positions, serial {serial_time:.3f}s")
+
+    for workers in worker_counts:
+        start_time = time.perf_counter()
+        assert find_loop_positions_parallel(grid, workers, chunk_size) == expected
+        elapsed = time.perf_counter() - start_time
+        print(f"  {workers} workers: {elapsed:.3f}s ({serial_time / elapsed:.2f}x)")
 
 
-def main(file_path: str, debug: bool = False) -> int:
+def run_query_benchmark(size: int, density: float, query_count: int) -> None:
+    import random
+
+    grid = random_map(size, density)
+    start_x, start_y, start_direction = find_start_position(grid)
+    queries = [
+        (random.randrange(size), random.randrange(size)) for _ in range(query_count)
+    ]
+
+    start_time = time.perf_counter()
+    turn_graph = TurnGraph(grid)
+    build_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    answers = [turn_graph.causes_loop(x, y) for x, y in queries]
+    graph_time = time.perf_counter() - start_time
+
+    # The same questions answered by re-walking the route from the start
+    detector = LoopDetector(grid)
+    start_state = detector.state(start_x, start_y, start_direction)
+    start_time = time.perf_counter()
+    expected = [
+        grid[y][x] == "." and detector.causes_loop((x, y), start_state)
+        for x, y in queries
+    ]
+    walk_time = time.perf_counter() - start_time
+    assert answers == expected
+
+    print(
+        f"{size}x{size}: turn graph built in {build_time:.3f}s, "
+        f"{query_count / graph_time:,.0f} queries/s; "
+        f"re-walking {query_count / walk_time:,.0f} queries/s"
+    )
+
+
+def main(
+    file_path: str,
+    debug: bool = False,
+    brent: bool = False,
+    workers: Optional[int] = None,
+) -> int:
     grid = read_input(file_path)
-    return find_loop_positions(grid, debug)
+    if workers:
+        return find_loop_positions_parallel(grid, workers, debug=debug, brent=brent)
+    return find_loop_positions(grid, debug, brent)
 
 
 if __name__ == "__main__":
@@ -151,11 +556,59 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Day 6: Guard Gallivant - Part 2")
     parser.add_argument("--debug", action="store_true", help="Enable debug output")
+    parser.add_argument(
+        "--brent",
+        action="store_true",
+        help="Detect loops with Brent's algorithm in constant memory",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Test obstructions in this many processes"
+    )
+    parser.add_argument(
+        "--benchmark", action="store_true", help="Benchmark the obstruction search"
+    )
+    parser.add_argument(
+        "--benchmark-queries",
+        type=int,
+        metavar="SIZE",
+        help="Time ad-hoc TurnGraph loop queries on a random SIZE x SIZE map",
+    )
+    parser.add_argument(
+        "--benchmark-workers",
+        type=int,
+        metavar="SIZE",
+        help="Time 1, 2, 4 and 8 workers on a random SIZE x SIZE map",
+    )
+    parser.add_argument(
+        "--sizes",
+        default="130,300",
+        help="Comma-separated map sizes for --benchmark",
+    )
+    parser.add_argument(
+        "--density", type=float, default=0.05, help="Obstacle density for --benchmark"
+    )
+    parser.add_argument(
+        "--baseline-max",
+        type=int,
+        default=130,
+        help="Largest map size also timed with the every-empty-cell search",
+    )
     args = parser.parse_args()
 
-    start_time = time.time()
-    result = main("input/day06.txt", args.debug)
-    elapsed = time.time() - start_time
+    if args.benchmark_queries:
+        run_query_benchmark(args.benchmark_queries, args.density, 10000)
+    elif args.benchmark_workers:
+        run_parallel_benchmark(args.benchmark_workers, args.density, [1, 2, 4, 8], 256)
+    elif args.benchmark:
+        run_benchmark(
+            [int(size) for size in args.sizes.split(",")],
+            args.density,
+            args.baseline_max,
+        )
+    else:
+        start_time = time.time()
+        result = main("input/day06.txt", args.debug, args.brent, args.workers)
+        elapsed = time.time() - start_time
 
-    print(f"Final answer: {result}")
-    print(f"Total time: {elapsed:.2f} seconds")
+        print(f"Final answer: {result}")
+        print(f"Total time: {elapsed:.2f} seconds")
@@ -0,0 +1,84 @@
+from typing import Iterator, List, Sequence, Tuple
+
+
+class Grid:
+    """A character grid stored as one flat bytearray with a padded border.
+
+    Cell ``(x, y)`` lives at flat index ``(y + pad) * stride + x + pad`` and
+    ``pad`` cells of ``border`` surround the grid on every side, so a walk
+    that steps by ``offsets`` can stop on the border value instead of
+    checking bounds. The border value should not occur inside the grid.
+    """
+
+    def __init__(self, lines: Sequence[bytes], pad: int = 1, border: int = 0) -> None:
+        self.height = len(lines)
+        self.width = max(map(len, lines), default=0)
+        self.pad = pad
+        self.border = border
+        self.stride = self.width + 2 * pad
+
+        fill = bytes([border])
+        edge = fill * (pad * self.stride + pad)
+        rows = (line.ljust(self.width, fill) for line in lines)
+        self.cells = bytearray(edge + (fill * (2 * pad)).join(rows) + edge)
+
+        # Flat steps up, right, down, left, then the four diagonals
+        stride = self.stride
+        self.offsets: Tuple[int, ...] = (-stride, 1, stride, -1)
+        self.diagonal_offsets: Tuple[int, ...] = (
+            -stride + 1,
+            stride + 1,
+            stride - 1,
+            -stride - 1,
+        )
+
+    @classmethod
+    def from_file(cls, file_path: str, pad: int = 1, border: int = 0) -> "Grid":
+        """Load a grid with one read; lines must not contain whitespace."""
+        with open(file_path, "rb") as file:
+            return cls(file.read().split(), pad, border)
+
+    @classmethod
+    def from_rows(
+        cls, rows: Sequence[Sequence[str]], pad: int = 1, border: int = 0
+    ) -> "Grid":
+        """Build a grid from rows of characters, e.g. ``List[str]``."""
+        # str rows encode directly; joining them would copy one char at a time
+        lines = [
+            (row if isinstance(row, str) else "".join(row)).encode() for row in rows
+        ]
+        return cls(lines, pad, border)
+
+    def index(self, x: int, y: int) -> int:
+        return (y + self.pad) * self.stride + x + self.pad
+
+    def position(self, index: int) -> Tuple[int, int]:
+        """Inverse of ``index``: the ``(x, y)`` of a flat index."""
+        y, x = divmod(index, self.stride)
+        return x - self.pad, y - self.pad
+
+    def __getitem__(self, position: Tuple[int, int]) -> int:
+        return self.cells[self.index(*position)]
+
+    def __setitem__(self, position: Tuple[int, int], value: int) -> None:
+        self.cells[self.index(*position)] = value
+
+    def row(self, y: int) -> memoryview:
+        """Zero-copy view of row ``y`` without its border cells."""
+        start = self.index(0, y)
+        return memoryview(self.cells)[start : start + self.width]
+
+    def rows(self) -> List[memoryview]:
+        return [self.row(y) for y in range(self.height)]
+
+    def find_all(self, value: int) -> Iterator[int]:
+        """Yield the flat index of every cell holding ``value``, in row order."""
+        cells = self.cells
+        index = cells.find(value)
+        while index != -1:
+            yield index
+            index = cells.find(value, index + 1)
+
+    def neighbours(self, index: int) -> List[int]:
+        """Flat indices of the four orthogonal neighbours of ``index``."""
+        return [index + offset for offset in self.offsets]